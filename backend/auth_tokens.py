@@ -0,0 +1,174 @@
+"""
+Jetons d'accès signés (HMAC-SHA256), vérifiés sans lecture MongoDB
+Format : v1.<kid>.<payload>.<signature>, payload et signature en base64url.
+Le payload porte l'artisan, le flag admin et l'expiration :
+    {"sub": "jdupont", "adm": false, "exp": 1767225600}
+
+Clés : ACCESS_TOKEN_KEYS="kid2:secret2,kid1:secret1". La première signe, toutes
+vérifient : pour une rotation, ajouter la nouvelle clé en tête, puis retirer
+l'ancienne une fois ACCESS_TOKEN_TTL écoulé. Sans configuration, une clé
+aléatoire est générée au démarrage (jetons invalidés au redémarrage et non
+partagés entre workers : à réserver au développement).
+
+Contrôle d'accès (dépendance du routeur /api) : une route dont le chemin ou la
+query porte `username` exige un jeton de cet artisan (ou d'un admin), les
+routes protégées par require_admin un jeton admin. Tant que AUTH_REQUIRED
+n'est pas activé, une requête sans jeton reste acceptée (migration des
+clients) ; un jeton signé présent est toujours vérifié, un ancien jeton (sans
+préfixe v1.) est ignoré comme s'il était absent. Le jeton est lu dans l'en-tête
+Authorization, et en query (?access_token=) sur les seuls flux SSE.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+TOKEN_VERSION = "v1"
+DEFAULT_ACCESS_TOKEN_TTL = 3600
+
+
+class Principal(BaseModel):
+    username: str
+    is_admin: bool = False
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _load_keys() -> Tuple[str, Dict[str, bytes]]:
+    """(kid de signature, {kid: secret}) depuis ACCESS_TOKEN_KEYS"""
+    keys: Dict[str, bytes] = {}
+    signing_kid = None
+    for entry in os.environ.get("ACCESS_TOKEN_KEYS", "").split(","):
+        kid, sep, secret = entry.strip().partition(":")
+        if not sep or not kid or not secret or "." in kid:
+            continue
+        keys[kid] = secret.encode()
+        signing_kid = signing_kid or kid
+    if signing_kid is None:
+        logger.warning("⚠️ ACCESS_TOKEN_KEYS absent : clé de signature éphémère (développement uniquement)")
+        signing_kid = "dev"
+        keys[signing_kid] = secrets.token_bytes(32)
+    return signing_kid, keys
+
+
+SIGNING_KID, TOKEN_KEYS = _load_keys()
+ACCESS_TOKEN_TTL = int(os.environ.get("ACCESS_TOKEN_TTL", str(DEFAULT_ACCESS_TOKEN_TTL)))
+
+
+def auth_required() -> bool:
+    return os.environ.get("AUTH_REQUIRED", "").lower() in ("1", "true", "yes")
+
+
+def _sign(kid: str, payload: str) -> str:
+    signed = f"{TOKEN_VERSION}.{kid}.{payload}".encode()
+    return _b64encode(hmac.new(TOKEN_KEYS[kid], signed, hashlib.sha256).digest())
+
+
+# ============ ÉMISSION / VÉRIFICATION ============
+
+def issue_access_token(username: str, is_admin: bool = False, ttl: Optional[int] = None) -> str:
+    expires = int(time.time()) + (ACCESS_TOKEN_TTL if ttl is None else ttl)
+    claims = {"sub": username, "adm": bool(is_admin), "exp": expires}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{TOKEN_VERSION}.{SIGNING_KID}.{payload}.{_sign(SIGNING_KID, payload)}"
+
+
+def verify_access_token(token: str) -> Principal:
+    """Vérifie signature et expiration (CPU seulement) ; lève ValueError si le jeton est refusé"""
+    parts = token.split(".")
+    if len(parts) != 4 or parts[0] != TOKEN_VERSION:
+        raise ValueError("Jeton mal formé")
+    _, kid, payload, signature = parts
+    if kid not in TOKEN_KEYS:
+        raise ValueError(f"Clé de signature inconnue: {kid}")
+    if not hmac.compare_digest(signature, _sign(kid, payload)):
+        raise ValueError("Signature invalide")
+    try:
+        claims = json.loads(_b64decode(payload))
+        username, is_admin, expires = claims["sub"], claims["adm"], claims["exp"]
+    except Exception as e:
+        raise ValueError("Payload invalide") from e
+    if expires < time.time():
+        raise ValueError("Jeton expiré")
+    return Principal(username=username, is_admin=is_admin)
+
+
+# ============ DÉPENDANCES FASTAPI ============
+
+# Flux SSE : EventSource ne permet pas d'en-têtes, le jeton y est accepté en
+# query (?access_token=). Partout ailleurs il finirait dans les logs des proxies,
+# l'historique du navigateur et les en-têtes Referer : en-tête uniquement.
+SSE_PATH_SUFFIX = "/events/stream"
+
+
+def _bearer_token(request: Request) -> Optional[str]:
+    header = request.headers.get("authorization", "")
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token.strip()
+    if request.url.path.endswith(SSE_PATH_SUFFIX):
+        return request.query_params.get("access_token")
+    return None
+
+
+def current_principal(request: Request) -> Optional[Principal]:
+    """Principal du jeton de la requête (mis en cache dans request.state), None sans jeton"""
+    if hasattr(request.state, "principal"):
+        return request.state.principal
+    token = _bearer_token(request)
+    principal = None
+    if token and not token.startswith(f"{TOKEN_VERSION}.") and not auth_required():
+        # Jeton hexadécimal d'avant les jetons signés, encore stocké par les clients
+        # non reconnectés : traité comme absent tant que l'authentification n'est pas exigée
+        token = None
+    if token:
+        try:
+            principal = verify_access_token(token)
+        except ValueError:
+            raise HTTPException(
+                status_code=401, detail="Jeton d'accès invalide ou expiré",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+    request.state.principal = principal
+    return principal
+
+
+def authorize_tenant(request: Request) -> None:
+    """Dépendance du routeur : le jeton doit appartenir à l'artisan ciblé par `username`"""
+    principal = current_principal(request)
+    username = request.path_params.get("username") or request.query_params.get("username")
+    if username is None:
+        return
+    if principal is None:
+        if auth_required():
+            raise HTTPException(status_code=401, detail="Authentification requise", headers={"WWW-Authenticate": "Bearer"})
+        return
+    if principal.username != username and not principal.is_admin:
+        raise HTTPException(status_code=403, detail="Accès refusé")
+
+
+def require_admin(request: Request) -> None:
+    """Dépendance des routes de la console Admin"""
+    principal = current_principal(request)
+    if principal is None:
+        if auth_required():
+            raise HTTPException(status_code=401, detail="Authentification requise", headers={"WWW-Authenticate": "Bearer"})
+        return
+    if not principal.is_admin:
+        raise HTTPException(status_code=403, detail="Accès réservé aux administrateurs")
@@ -0,0 +1,196 @@
+"""
+Import en masse (CSV ou NDJSON) pour les clients et le stock
+Le fichier est lu ligne par ligne depuis l'upload (jamais chargé en entier),
+les lignes sont validées puis écrites par lots avec insert_many non ordonné.
+Chaque ligne invalide ou refusée par MongoDB est rapportée avec son numéro.
+
+Le début du fichier sert à deviner l'encodage (UTF-8, sinon Windows-1252 :
+export Excel français) et le séparateur CSV (, ; tabulation ou |).
+"""
+import codecs
+import csv
+import json
+import logging
+from typing import Awaitable, Callable, Iterator, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+SUPPORTED_FORMATS = ("csv", "ndjson")
+
+SNIFF_SIZE = 64 * 1024
+SNIFF_SAMPLE_CHARS = 8192
+CSV_DELIMITERS = ",;\t|"
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str], explicit: Optional[str] = None) -> str:
+    """Format de l'upload : paramètre explicite, sinon extension, sinon content-type"""
+    if explicit:
+        fmt = explicit.lower()
+    elif filename and filename.lower().endswith(".csv"):
+        fmt = "csv"
+    elif filename and filename.lower().endswith((".ndjson", ".jsonl", ".json")):
+        fmt = "ndjson"
+    elif content_type and "csv" in content_type:
+        fmt = "csv"
+    else:
+        fmt = "ndjson"
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f"Format non supporté: {fmt} (attendu: csv ou ndjson)")
+    return fmt
+
+
+def _text_lines(head: bytes, binary_file, encoding: str) -> Iterator[str]:
+    """
+    Lignes décodées une à une (fins de ligne conservées pour le module csv) :
+    une erreur de décodage est levée sur la ligne fautive, jamais plus loin.
+    """
+    # cp1252 laisse 5 octets non définis : remplacés plutôt que de faire échouer l'import
+    errors = "replace" if encoding == "cp1252" else "strict"
+    line_encoding = "utf-8" if encoding == "utf-8-sig" else encoding
+    pending, chunk, first = b"", head, True
+    while chunk:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield (line + b"\n").decode(encoding if first else line_encoding, errors)
+            first = False
+        chunk = binary_file.read(SNIFF_SIZE)
+    if pending:
+        yield pending.decode(encoding if first else line_encoding, errors)
+
+
+def _detect_encoding(head: bytes) -> str:
+    """utf-8-sig si le début du fichier est de l'UTF-8 valide, sinon cp1252"""
+    try:
+        # final=False : un caractère multi-octets coupé en fin d'échantillon n'est pas une erreur
+        codecs.getincrementaldecoder("utf-8-sig")().decode(head, final=False)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "cp1252"
+
+
+def _detect_dialect(sample: str):
+    """
+    Séparateur deviné par csv.Sniffer sur les premières lignes ; s'il échoue
+    (champs multi-lignes...), séparateur le plus fréquent de la ligne d'en-têtes.
+    """
+    sample = sample[:SNIFF_SAMPLE_CHARS]
+    if len(sample) == SNIFF_SAMPLE_CHARS and "\n" in sample:
+        sample = sample[:sample.rindex("\n")]
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS)
+    except csv.Error:
+        header = sample.lstrip("\ufeff").split("\n", 1)[0]
+        # À égalité (aucun séparateur trouvé), max() garde la virgule
+        return type("HeaderDialect", (csv.excel,), {"delimiter": max(CSV_DELIMITERS, key=header.count)})
+
+
+def _parse(text, fmt: str, dialect) -> Iterator[Tuple[int, object]]:
+    if fmt == "csv":
+        for index, row in enumerate(csv.DictReader(text, dialect=dialect), start=1):
+            # Cellules vides -> None, pour que les champs optionnels restent absents
+            yield index, {key.strip(): (value.strip() or None) if isinstance(value, str) else value
+                          for key, value in row.items() if key}
+    else:
+        index = 0
+        for line in text:
+            if not line.strip():
+                continue
+            index += 1
+            try:
+                yield index, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield index, ValueError(f"JSON invalide: {e.msg}")
+
+
+def iter_rows(binary_file, fmt: str) -> Iterator[Tuple[int, object]]:
+    """
+    Itère (numéro de ligne de données, contenu) sur un fichier binaire.
+    Une ligne NDJSON illisible est renvoyée comme exception à rapporter ;
+    des octets non UTF-8 au-delà de l'échantillon analysé arrêtent la lecture
+    avec une erreur rapportée sur la ligne fautive.
+    """
+    head = binary_file.read(SNIFF_SIZE)
+    encoding = _detect_encoding(head)
+    dialect = None
+    if fmt == "csv":
+        sample = codecs.getincrementaldecoder(encoding)(errors="replace").decode(head, final=False)
+        dialect = _detect_dialect(sample)
+    index = 0
+    try:
+        for index, row in _parse(_text_lines(head, binary_file, encoding), fmt, dialect):
+            yield index, row
+    except UnicodeDecodeError:
+        yield index + 1, ValueError("Encodage invalide (fichier attendu en UTF-8 ou Windows-1252), import interrompu")
+
+
+def _error_message(error: Exception) -> str:
+    """Message court ; les ValidationError Pydantic sont résumées champ par champ"""
+    if hasattr(error, "errors") and callable(error.errors):
+        return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+
+async def import_rows(
+    rows: Iterator[Tuple[int, object]],
+    build_document: Callable[[dict], dict],
+    collection,
+    after_chunk: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> dict:
+    """
+    Valide et insère les lignes par lots. build_document(row) retourne le
+    document à insérer ou lève une exception (ValueError, ValidationError...)
+    pour refuser la ligne. after_chunk reçoit les documents effectivement
+    insérés de chaque lot (compteurs, etc.).
+
+    Retourne : {'inserted': int, 'error_count': int, 'errors': [{'row', 'error'}]}
+    """
+    report = {"inserted": 0, "error_count": 0, "errors": []}
+
+    def reject(row_number: int, error: str):
+        report["error_count"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row_number, "error": error})
+
+    async def flush(batch: List[Tuple[int, dict]]):
+        if not batch:
+            return
+        docs = [doc for _, doc in batch]
+        failed = set()
+        try:
+            await collection.insert_many(docs, ordered=False)
+        except BulkWriteError as bwe:
+            for error in bwe.details.get("writeErrors", []):
+                failed.add(error["index"])
+                reject(batch[error["index"]][0], error.get("errmsg", "Erreur d'écriture"))
+        inserted = [doc for position, doc in enumerate(docs) if position not in failed]
+        report["inserted"] += len(inserted)
+        if after_chunk and inserted:
+            await after_chunk(inserted)
+
+    batch: List[Tuple[int, dict]] = []
+    for row_number, row in rows:
+        if isinstance(row, Exception):
+            reject(row_number, str(row))
+            continue
+        if not isinstance(row, dict):
+            reject(row_number, "Chaque ligne doit être un objet")
+            continue
+        try:
+            batch.append((row_number, build_document(row)))
+        except Exception as e:
+            reject(row_number, _error_message(e))
+            continue
+        if len(batch) >= chunk_size:
+            await flush(batch)
+            batch = []
+    await flush(batch)
+
+    logger.info(f"📥 Import {collection.name}: {report['inserted']} ligne(s) insérée(s), {report['error_count']} erreur(s)")
+    return report
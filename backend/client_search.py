@@ -0,0 +1,60 @@
+"""
+Recherche de clients par préfixe, insensible à la casse et aux accents
+Chaque client porte des champs dérivés :
+    search_prefixes : tous les préfixes des mots (repliés) de name, email,
+                      city et postal_code -> index multikey
+    name_sort       : nom replié, pour un tri stable et indexé
+Une recherche "dup par" devient alors une égalité sur search_prefixes servie
+par l'index (username, search_prefixes, name_sort, id).
+Un email est découpé comme le reste : "jean.dup" cherche les mots "jean" et
+"dup", qui sont des préfixes des mots de "jean.dupont@mail.fr".
+"""
+import re
+import unicodedata
+from typing import List, Optional
+
+SEARCHABLE_FIELDS = ("name", "email", "city", "postal_code")
+MAX_PREFIX_LENGTH = 20
+MAX_QUERY_TERMS = 5
+
+# Champs dérivés à ne jamais renvoyer au frontend
+SEARCH_FIELDS_PROJECTION = {"search_prefixes": 0, "name_sort": 0}
+
+_TOKEN_SPLIT = re.compile(r"[^0-9a-z]+")
+# Préfixe hors de l'alphabet des mots : jamais atteignable par une recherche
+STALE_PREFIX_PATTERN = "[^0-9a-z]"
+
+
+def fold(text: Optional[str]) -> str:
+    """Minuscules sans accents : 'Élodie Müller' -> 'elodie muller'"""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower().strip()
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return [token for token in _TOKEN_SPLIT.split(fold(text)) if token]
+
+
+def _prefixes(token: str) -> List[str]:
+    return [token[:length] for length in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1)]
+
+
+def search_fields(client: dict) -> dict:
+    """Champs dérivés à enregistrer avec le client (création, mise à jour, import)"""
+    prefixes = set()
+    for field in SEARCHABLE_FIELDS:
+        for token in tokenize(client.get(field)):
+            prefixes.update(_prefixes(token))
+    return {"search_prefixes": sorted(prefixes), "name_sort": fold(client.get("name"))}
+
+
+def search_filter(username: str, query: str) -> Optional[dict]:
+    """Filtre MongoDB pour une saisie utilisateur ; None si la saisie ne contient aucun mot"""
+    terms = [term[:MAX_PREFIX_LENGTH] for term in tokenize(query)][:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    # Le terme le plus long est le plus sélectif : il porte l'égalité servie par l'index
+    terms.sort(key=len, reverse=True)
+    return {"username": username, "search_prefixes": {"$all": terms}}
@@ -0,0 +1,61 @@
+"""
+Statistiques du tableau de bord calculées côté MongoDB
+Chaque collection est réduite à quelques compteurs par un pipeline
+d'agrégation ($match sur l'index username puis $group / $cond) ; les trois
+pipelines sont exécutés en parallèle et seuls les nombres transitent.
+"""
+import asyncio
+from typing import Dict
+
+QUOTES_PIPELINE = [
+    {"$group": {
+        "_id": None,
+        "total_quotes": {"$sum": 1},
+        "pending_quotes": {"$sum": {"$cond": [{"$eq": ["$status", "draft"]}, 1, 0]}},
+    }},
+]
+
+INVOICES_PIPELINE = [
+    {"$group": {
+        "_id": None,
+        "total_invoices": {"$sum": 1},
+        "pending_invoices": {"$sum": {"$cond": [{"$eq": ["$status", "unpaid"]}, 1, 0]}},
+        "total_revenue": {"$sum": {"$cond": [{"$eq": ["$status", "paid"]}, "$total_ttc", 0]}},
+    }},
+]
+
+INVENTORY_PIPELINE = [
+    {"$group": {
+        "_id": None,
+        "total_inventory_items": {"$sum": 1},
+        "low_stock_items": {"$sum": {"$cond": [{"$lte": ["$quantity", "$min_stock"]}, 1, 0]}},
+    }},
+]
+
+EMPTY_STATS = {
+    "total_revenue": 0,
+    "pending_invoices": 0,
+    "pending_quotes": 0,
+    "low_stock_items": 0,
+    "total_quotes": 0,
+    "total_invoices": 0,
+    "total_inventory_items": 0,
+}
+
+
+async def _aggregate(collection, username: str, pipeline: list) -> dict:
+    results = await collection.aggregate([{"$match": {"username": username}}, *pipeline]).to_list(1)
+    if not results:
+        return {}
+    results[0].pop("_id", None)
+    return results[0]
+
+
+async def compute_dashboard_stats(db, username: str) -> Dict[str, float]:
+    """Même résultat que l'ancienne boucle Python de /dashboard/stats, sans charger les documents"""
+    quotes, invoices, inventory = await asyncio.gather(
+        _aggregate(db.quotes, username, QUOTES_PIPELINE),
+        _aggregate(db.invoices, username, INVOICES_PIPELINE),
+        _aggregate(db.inventory, username, INVENTORY_PIPELINE),
+    )
+    return {**EMPTY_STATS, **quotes, **invoices, **inventory}
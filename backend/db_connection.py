@@ -0,0 +1,158 @@
+"""
+Connexion MongoDB configurable par variables d'environnement
+Dimensionnement du pool, compression réseau, timeouts et préférence de
+lecture du chemin "lecture seule", plus des métriques d'attente du pool pour
+ajuster maxPoolSize au nombre de workers.
+
+Variables (toutes optionnelles) :
+    MONGO_MAX_POOL_SIZE                 (défaut 100)
+    MONGO_MIN_POOL_SIZE                 (défaut 0)
+    MONGO_MAX_IDLE_TIME_MS              (défaut 300000)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS   (défaut 5000)
+    MONGO_CONNECT_TIMEOUT_MS            (défaut 10000)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS         (défaut : pas de limite)
+    MONGO_COMPRESSORS                   (défaut "zstd,zlib" ; ajouter snappy
+                                         si python-snappy est installé, les
+                                         compresseurs indisponibles sont
+                                         ignorés par pymongo)
+    MONGO_READ_PREFERENCE               (défaut "primary" ; "secondaryPreferred"
+                                         déporte les endpoints en lecture seule
+                                         sur les secondaires, au prix de la
+                                         lecture de ses propres écritures : une
+                                         liste relue juste après une création
+                                         peut ne pas encore la contenir)
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def mongo_client_options() -> dict:
+    """Options passées à AsyncIOMotorClient, lues depuis l'environnement"""
+    options = {
+        "maxPoolSize": _env_int("MONGO_MAX_POOL_SIZE", 100),
+        "minPoolSize": _env_int("MONGO_MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": _env_int("MONGO_MAX_IDLE_TIME_MS", 300000),
+        "serverSelectionTimeoutMS": _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+        "connectTimeoutMS": _env_int("MONGO_CONNECT_TIMEOUT_MS", 10000),
+        "compressors": os.environ.get("MONGO_COMPRESSORS", "zstd,zlib"),
+        "tz_aware": True,  # dates BSON relues en UTC (aware)
+    }
+    wait_queue_timeout = _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", None)
+    if wait_queue_timeout is not None:
+        options["waitQueueTimeoutMS"] = wait_queue_timeout
+    return options
+
+
+def read_only_preference():
+    """Préférence de lecture pour les endpoints en lecture seule (listes, tableau de bord)"""
+    name = os.environ.get("MONGO_READ_PREFERENCE", "primary")
+    return make_read_preference(read_pref_mode_from_name(name), None)
+
+
+# ============ MÉTRIQUES DU POOL ============
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Compteurs d'attente du pool de connexions. Le début et la fin d'un
+    checkout ont lieu dans le même thread (motor exécute pymongo dans un
+    executor), ce qui permet de mesurer l'attente via un threading.local.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkout_failures: Dict[str, int] = {}
+            self.in_use = 0
+            self.max_in_use = 0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+            self.connections_created = 0
+            self.connections_closed = 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "connections_open": self.connections_created - self.connections_closed,
+                "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+            }
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        wait_ms = (time.perf_counter() - started) * 1000 if started is not None else 0.0
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            reason = str(event.reason)
+            self.checkout_failures[reason] = self.checkout_failures.get(reason, 0) + 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+
+pool_metrics = PoolMetrics()
+
+
+def create_mongo_client(mongo_url: str) -> AsyncIOMotorClient:
+    options = mongo_client_options()
+    logger.info(
+        f"🍃 MongoDB pool: max={options['maxPoolSize']} min={options['minPoolSize']} "
+        f"compressors={options['compressors']}"
+    )
+    return AsyncIOMotorClient(mongo_url, event_listeners=[pool_metrics], **options)
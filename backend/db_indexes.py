@@ -0,0 +1,271 @@
+"""
+Gestion des index MongoDB
+Déclare les index requis par collection, les crée de façon idempotente au
+démarrage, signale les écarts (drift) et vérifie via explain() qu'aucune
+requête critique ne fait de COLLSCAN.
+
+Usage en ligne de commande :
+    python db_indexes.py            # crée les index manquants + rapport de drift
+    python db_indexes.py --check    # idem + vérification explain(), code 1 si COLLSCAN
+"""
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from sync import TOMBSTONE_RETENTION
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logger = logging.getLogger(__name__)
+
+# Filtre partiel pour les identifiants uniques optionnels : seules les chaînes
+# non vides sont indexées, les documents avec null / champ absent ne se
+# bloquent donc pas entre eux. Une égalité sur une chaîne satisfait ce filtre,
+# le planner peut donc utiliser l'index pour les find_one({"champ": valeur}).
+NON_EMPTY_STRING = {"$gt": ""}
+
+
+def _unique_optional(field: str) -> IndexModel:
+    return IndexModel(
+        [(field, ASCENDING)],
+        name=f"{field}_unique",
+        unique=True,
+        partialFilterExpression={field: NON_EMPTY_STRING},
+    )
+
+
+# ============ INDEX DECLARÉS ============
+
+COLLECTION_INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        _unique_optional("email_normalized"),
+        _unique_optional("mobile"),
+        _unique_optional("vatNumber"),
+        IndexModel([("gstNumber", ASCENDING)], name="gstNumber", sparse=True),
+        _unique_optional("stripe_card_fingerprint"),
+    ],
+    "sessions": [
+        # _id = SHA-256 du refresh token (unique par construction)
+        IndexModel([("username", ASCENDING)], name="username"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "quotes": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("username", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="username_created_at_id"),
+        IndexModel([("username", ASCENDING), ("updated_at", ASCENDING), ("id", ASCENDING)], name="username_updated_at_id"),
+    ],
+    "invoices": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("username", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="username_created_at_id"),
+        IndexModel([("username", ASCENDING), ("updated_at", ASCENDING), ("id", ASCENDING)], name="username_updated_at_id"),
+    ],
+    "clients": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("username", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="username_created_at_id"),
+        IndexModel([("username", ASCENDING), ("updated_at", ASCENDING), ("id", ASCENDING)], name="username_updated_at_id"),
+        IndexModel(
+            [("username", ASCENDING), ("search_prefixes", ASCENDING), ("name_sort", ASCENDING), ("id", ASCENDING)],
+            name="username_search_prefixes_name",
+        ),
+    ],
+    "inventory": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("username", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="username_created_at_id"),
+        IndexModel([("username", ASCENDING), ("updated_at", ASCENDING), ("id", ASCENDING)], name="username_updated_at_id"),
+        # Index partiel : seuls les articles en stock bas y figurent
+        IndexModel(
+            [("username", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="low_stock_username_created_at_id",
+            partialFilterExpression={"is_low_stock": True},
+        ),
+    ],
+    "stock_movements": [
+        IndexModel([("username", ASCENDING), ("item_id", ASCENDING), ("created_at", DESCENDING)], name="username_item_created_at"),
+    ],
+    "tombstones": [
+        IndexModel([("username", ASCENDING), ("deleted_at", ASCENDING), ("id", ASCENDING)], name="username_deleted_at_id"),
+        IndexModel([("deleted_at", ASCENDING)], name="deleted_at_ttl", expireAfterSeconds=int(TOMBSTONE_RETENTION.total_seconds())),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "subscriptions": [
+        IndexModel([("username", ASCENDING)], name="username"),
+        IndexModel([("stripe_subscription_id", ASCENDING)], name="stripe_subscription_id", sparse=True),
+    ],
+    "password_resets": [
+        _unique_optional("token_hash"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "contact_messages": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)], name="status_created_at"),
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+}
+
+# Formes de requêtes "chaudes" vérifiées par explain() en mode self-check.
+# (collection, filtre, tri) - les valeurs sont factices, seule la forme compte.
+HOT_QUERIES = [
+    ("users", {"email_normalized": "check@example.com"}, None),
+    ("users", {"username": "check"}, None),
+    ("users", {"mobile": "+33600000000"}, None),
+    ("users", {"vatNumber": "FR00000000000"}, None),
+    ("users", {"gstNumber": "000000000RT0000"}, None),
+    ("users", {"stripe_card_fingerprint": "check"}, None),
+    ("quotes", {"username": "check"}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("quotes", {"id": "check", "username": "check"}, None),
+    ("invoices", {"username": "check"}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("invoices", {"id": "check", "username": "check"}, None),
+    ("clients", {"username": "check"}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("clients", {"id": "check", "username": "check"}, None),
+    ("clients", {"username": "check", "search_prefixes": {"$all": ["check"]}}, [("name_sort", ASCENDING), ("id", ASCENDING)]),
+    ("inventory", {"username": "check"}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("inventory", {"id": "check", "username": "check"}, None),
+    ("inventory", {"username": "check", "is_low_stock": True}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    *[(name, {"username": "check", "updated_at": {"$gt": datetime(1970, 1, 1)}}, [("updated_at", ASCENDING), ("id", ASCENDING)])
+      for name in ("quotes", "invoices", "clients", "inventory")],
+    ("tombstones", {"username": "check", "deleted_at": {"$gt": datetime(1970, 1, 1)}}, [("deleted_at", ASCENDING), ("id", ASCENDING)]),
+    ("sessions", {"_id": "check", "expires_at": {"$gt": datetime(1970, 1, 1)}}, None),
+    ("sessions", {"username": "check"}, None),
+    ("subscriptions", {"username": "check"}, None),
+    ("subscriptions", {"stripe_subscription_id": "check"}, None),
+    ("password_resets", {"token_hash": "check", "type": "password", "expires_at": {"$gt": datetime(1970, 1, 1)}}, None),
+    ("contact_messages", {}, [("created_at", DESCENDING)]),
+    ("contact_messages", {"status": "new"}, [("created_at", DESCENDING)]),
+    ("contact_messages", {"id": "check"}, None),
+]
+
+
+def _index_options(info: dict) -> dict:
+    """Options significatives d'un index (pour comparer déclaré vs existant)"""
+    return {
+        "key": list(info.get("key", [])),
+        "unique": bool(info.get("unique", False)),
+        "sparse": bool(info.get("sparse", False)),
+        "partialFilterExpression": info.get("partialFilterExpression"),
+        "expireAfterSeconds": info.get("expireAfterSeconds"),
+        "weights": info.get("weights"),
+    }
+
+
+def _declared_options(model: IndexModel) -> dict:
+    doc = model.document
+    return _index_options({
+        **doc,
+        "key": [(k, v) for k, v in doc["key"].items()],
+    })
+
+
+async def ensure_indexes(db) -> Dict[str, dict]:
+    """
+    Crée les index déclarés manquants et retourne un rapport de drift par collection :
+    {
+        'created': [noms créés],
+        'mismatched': [noms existants dont la définition diffère],
+        'unmanaged': [index présents en base mais non déclarés],
+        'errors': [messages d'erreur de création]
+    }
+    Les index existants ne sont jamais supprimés ni reconstruits automatiquement.
+    """
+    report = {}
+    for collection_name, models in COLLECTION_INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        declared_names = {m.document["name"] for m in models}
+        entry = {"created": [], "mismatched": [], "unmanaged": [], "errors": []}
+
+        for model in models:
+            name = model.document["name"]
+            if name in existing:
+                if _index_options(existing[name]) != _declared_options(model):
+                    entry["mismatched"].append(name)
+                continue
+            try:
+                await collection.create_indexes([model])
+                entry["created"].append(name)
+            except OperationFailure as e:
+                # Ex: doublons existants empêchant un index unique
+                entry["errors"].append(f"{name}: {e}")
+
+        entry["unmanaged"] = sorted(n for n in existing if n != "_id_" and n not in declared_names)
+        report[collection_name] = entry
+
+        if entry["created"]:
+            logger.info(f"🗂️  Index créés sur {collection_name}: {', '.join(entry['created'])}")
+        if entry["mismatched"]:
+            logger.warning(f"⚠️ Index divergents sur {collection_name}: {', '.join(entry['mismatched'])}")
+        if entry["unmanaged"]:
+            logger.warning(f"⚠️ Index non déclarés sur {collection_name}: {', '.join(entry['unmanaged'])}")
+        for error in entry["errors"]:
+            logger.error(f"❌ Création d'index impossible sur {collection_name}: {error}")
+
+    return report
+
+
+def _plan_stages(plan) -> List[str]:
+    """Liste récursive des stages d'un plan explain() (formats classique et SBE)"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(_plan_stages(value))
+    return stages
+
+
+async def verify_index_coverage(db) -> List[dict]:
+    """
+    Exécute explain() sur chaque forme de requête de HOT_QUERIES.
+    Retourne la liste des requêtes dont le plan gagnant contient un COLLSCAN.
+    """
+    failures = []
+    for collection_name, query, sort in HOT_QUERIES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        winning_plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+        stages = _plan_stages(winning_plan)
+        if "COLLSCAN" in stages:
+            failures.append({"collection": collection_name, "query": query, "sort": sort, "stages": stages})
+            logger.error(f"❌ COLLSCAN détecté sur {collection_name} pour {query} (tri: {sort})")
+    if not failures:
+        logger.info(f"✅ Couverture d'index vérifiée ({len(HOT_QUERIES)} requêtes)")
+    return failures
+
+
+async def _main(check: bool) -> int:
+    from db_connection import create_mongo_client
+
+    client = create_mongo_client(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        report = await ensure_indexes(db)
+        for collection_name, entry in report.items():
+            print(f"{collection_name}: {entry}")
+        if any(entry["errors"] for entry in report.values()):
+            return 1
+        if check and await verify_index_coverage(db):
+            return 1
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(_main(check="--check" in sys.argv[1:])))
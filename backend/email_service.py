@@ -3,13 +3,14 @@ Service d'envoi d'emails via AWS SES SMTP
 Supporte l'envoi d'emails de confirmation et de notification
 """
 
+import html
 import smtplib
 import os
 import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pathlib import Path
 from dotenv import load_dotenv
 import traceback
@@ -332,3 +333,71 @@ def send_contact_notification_email(
     """
     
     return send_email(admin_email, subject, html_content, text_content)
+
+
+def send_low_stock_alert_email(to_email: str, username: str, items: List[dict]) -> bool:
+    """
+    Prévient l'artisan que des articles viennent de passer sous leur stock minimum
+
+    Args:
+        to_email: Email de l'artisan
+        username: Identifiant de l'artisan
+        items: Articles concernés (name, reference, quantity, min_stock)
+
+    Returns:
+        bool: True si l'envoi a réussi
+    """
+
+    subject = f"⚠️ Stock bas - {len(items)} article(s) à réapprovisionner"
+
+    # Nom et référence sont saisis par l'artisan (ou importés) : échappés dans le HTML
+    rows = "".join(f"""
+                <tr>
+                    <td style="padding: 10px; border: 1px solid #e5e7eb;">{html.escape(str(item.get('name') or ''))}</td>
+                    <td style="padding: 10px; border: 1px solid #e5e7eb;">{html.escape(str(item.get('reference') or ''))}</td>
+                    <td style="padding: 10px; border: 1px solid #e5e7eb; text-align: right;">{html.escape(str(item.get('quantity')))}</td>
+                    <td style="padding: 10px; border: 1px solid #e5e7eb; text-align: right;">{html.escape(str(item.get('min_stock')))}</td>
+                </tr>""" for item in items)
+
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    </head>
+    <body style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px;">
+        <div style="background: #1f2937; color: white; padding: 20px; border-radius: 8px 8px 0 0;">
+            <h1 style="margin: 0; font-size: 22px;">⚠️ Alerte stock bas</h1>
+        </div>
+        <div style="background: #ffffff; padding: 25px; border: 1px solid #e5e7eb; border-top: none; border-radius: 0 0 8px 8px;">
+            <p>Bonjour {html.escape(username)},</p>
+            <p>Les articles suivants viennent de passer sous leur stock minimum :</p>
+            <table style="width: 100%; border-collapse: collapse; margin: 20px 0;">
+                <tr style="background: #f9fafb;">
+                    <th style="padding: 10px; border: 1px solid #e5e7eb; text-align: left;">Article</th>
+                    <th style="padding: 10px; border: 1px solid #e5e7eb; text-align: left;">Référence</th>
+                    <th style="padding: 10px; border: 1px solid #e5e7eb; text-align: right;">Stock</th>
+                    <th style="padding: 10px; border: 1px solid #e5e7eb; text-align: right;">Minimum</th>
+                </tr>{rows}
+            </table>
+            <div style="text-align: center; margin-top: 25px;">
+                <a href="https://artisanflow-appli.com/inventory"
+                   style="display: inline-block; background: #FF7A2F; color: white; text-decoration: none; padding: 12px 24px; border-radius: 6px; font-weight: 600;">
+                    Voir le stock
+                </a>
+            </div>
+        </div>
+        <div style="text-align: center; margin-top: 20px; font-size: 12px; color: #9ca3af;">
+            <p>© 2025 ArtisanFlow - Notification automatique</p>
+        </div>
+    </body>
+    </html>
+    """
+
+    text_content = "Alerte stock bas\n\n" + "\n".join(
+        f"- {item.get('name', '')} ({item.get('reference', '')}) : {item.get('quantity')} / minimum {item.get('min_stock')}"
+        for item in items
+    ) + "\n\nVoir le stock : https://artisanflow-appli.com/inventory"
+
+    return send_email(to_email, subject, html_content, text_content)
@@ -0,0 +1,72 @@
+"""
+ETags forts pour les listes par artisan et la configuration
+Un document tenant_versions par artisan (_id = username) porte un compteur
+par ressource, incrémenté après chaque écriture :
+    {"_id": "jdupont", "epoch": "...", "quotes": 12, "clients": 3, ...}
+
+L'ETag d'une réponse dérive de (epoch, ressource, version, paramètres de la
+requête). Si If-None-Match correspond, l'endpoint répond 304 après la seule
+lecture par _id de tenant_versions, sans lire ni sérialiser la liste.
+L'epoch (aléatoire, posé à la création du document) évite qu'un ETag émis
+avant une remise à zéro des compteurs corresponde à nouveau.
+"""
+import hashlib
+import uuid
+from typing import Optional
+
+from fastapi import Request, Response
+from pymongo.errors import DuplicateKeyError
+
+VERSIONED_RESOURCES = ("quotes", "invoices", "clients", "inventory", "configuration")
+
+# À incrémenter si la forme des réponses change (invalide les caches existants)
+RESPONSE_SCHEMA = "1"
+
+# Le navigateur garde la réponse mais la revalide à chaque navigation
+CACHE_CONTROL = "private, no-cache"
+
+
+async def bump_version(db, username: str, *resources: str) -> None:
+    """Invalide les ETags des ressources après une écriture réussie"""
+    await db.tenant_versions.update_one(
+        {"_id": username},
+        {"$inc": {resource: 1 for resource in resources}, "$setOnInsert": {"epoch": uuid.uuid4().hex}},
+        upsert=True,
+    )
+
+
+async def resource_etag(db, request: Request, username: str, resource: str, session=None) -> str:
+    """
+    ETag fort de la réponse courante pour `resource` (une lecture par _id).
+    `db` doit lire le primaire : une version lue sur un secondaire en retard
+    validerait le cache du client juste après une écriture.
+    """
+    versions = await db.tenant_versions.find_one({"_id": username}, {"epoch": 1, resource: 1}, session=session)
+    if versions is None:
+        try:
+            await db.tenant_versions.insert_one({"_id": username, "epoch": uuid.uuid4().hex})
+        except DuplicateKeyError:
+            pass
+        versions = await db.tenant_versions.find_one({"_id": username}, {"epoch": 1, resource: 1}, session=session)
+    # Paramètres triés : ?limit=50&username=x et ?username=x&limit=50 sont la même représentation
+    params = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    key = f"{RESPONSE_SCHEMA}:{versions['epoch']}:{resource}:{versions.get(resource, 0)}:{request.url.path}?{params}"
+    return '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Réponse 304 si le client possède déjà cette représentation, sinon None"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    # Comparaison faible (RFC 9110) : un proxy qui compresse peut préfixer W/
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return None
+
+
+def with_etag(response: Response, etag: str) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
@@ -0,0 +1,161 @@
+"""
+Événements temps réel (Server-Sent Events)
+Un bus pub/sub en mémoire distribue les événements aux flux SSE ouverts :
+    tenant:<username>   compteurs du tableau de bord, statut d'abonnement
+    admin               nouveaux messages de contact
+
+Par défaut les endpoints publient directement dans le bus du processus.
+Avec plusieurs workers, EVENTS_CHANGE_STREAMS=true fait passer les événements
+par les change streams MongoDB (replica set requis) : chaque worker observe
+tenant_stats, subscriptions et contact_messages et alimente son propre bus,
+les publications directes sont alors désactivées pour éviter les doublons.
+"""
+import asyncio
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import OperationFailure, PyMongoError
+
+from dashboard_stats import EMPTY_STATS
+
+logger = logging.getLogger(__name__)
+
+ADMIN_CHANNEL = "admin"
+QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+SUBSCRIPTION_FIELDS = ("status", "is_active", "cancel_at_period_end", "current_period_end")
+
+
+def tenant_channel(username: str) -> str:
+    return f"tenant:{username}"
+
+
+def change_streams_enabled() -> bool:
+    return os.environ.get("EVENTS_CHANGE_STREAMS", "").lower() in ("1", "true", "yes")
+
+
+# ============ BUS EN MÉMOIRE ============
+
+class EventBus:
+    """Pub/sub par canal ; chaque abonné a une file bornée (les plus anciens événements sautent)"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def has_subscribers(self, channel: str) -> bool:
+        return bool(self._subscribers.get(channel))
+
+    def publish(self, channel: str, event_type: str, data: dict) -> None:
+        for queue in self._subscribers.get(channel, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait((event_type, data))
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str):
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._subscribers.setdefault(channel, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+
+event_bus = EventBus()
+
+
+def publish_event(channel: str, event_type: str, data: dict) -> None:
+    """Publication directe depuis un endpoint (ignorée si les change streams s'en chargent)"""
+    if not change_streams_enabled():
+        event_bus.publish(channel, event_type, data)
+
+
+def wants_dashboard_events(username: str) -> bool:
+    """Vrai si un flux local attend les compteurs de cet artisan (évite de relire tenant_stats sinon)"""
+    return not change_streams_enabled() and event_bus.has_subscribers(tenant_channel(username))
+
+
+def dashboard_payload(stats: dict) -> dict:
+    return {field: stats.get(field, default) for field, default in EMPTY_STATS.items()}
+
+
+def subscription_payload(subscription: dict) -> dict:
+    return {field: subscription.get(field) for field in SUBSCRIPTION_FIELDS}
+
+
+async def publish_subscription_change(db, stripe_subscription_id: Optional[str]) -> None:
+    """Relit l'abonnement mis à jour par le webhook Stripe et prévient l'artisan"""
+    if not stripe_subscription_id or change_streams_enabled():
+        return
+    subscription = await db.subscriptions.find_one({"stripe_subscription_id": stripe_subscription_id}, {"_id": 0})
+    if subscription and subscription.get("username"):
+        event_bus.publish(tenant_channel(subscription["username"]), "subscription", subscription_payload(subscription))
+
+
+# ============ FLUX SSE ============
+
+def format_sse(event_type: str, data: dict) -> str:
+    return f"event: {event_type}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+
+async def sse_stream(request, channel: str, initial_events=()):
+    """
+    Générateur pour StreamingResponse : événements initiaux, puis ceux du canal.
+    Un commentaire est envoyé toutes les HEARTBEAT_SECONDS pour garder la
+    connexion ouverte derrière les proxies et détecter la déconnexion.
+    """
+    async with event_bus.subscribe(channel) as queue:
+        yield f"retry: {HEARTBEAT_SECONDS * 1000}\n\n"
+        for event_type, data in initial_events:
+            yield format_sse(event_type, data)
+        while not await request.is_disconnected():
+            try:
+                event_type, data = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield format_sse(event_type, data)
+
+
+# ============ CHANGE STREAMS ============
+
+async def _watch(collection, pipeline, handle) -> None:
+    """Suit un change stream et reprend après une erreur transitoire grâce au resume token"""
+    resume_token = None
+    while True:
+        try:
+            async with collection.watch(pipeline, full_document="updateLookup", resume_after=resume_token) as stream:
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    document = change.get("fullDocument")
+                    if document:
+                        handle(document)
+        except OperationFailure as e:
+            # Serveur standalone, droits insuffisants... : inutile de réessayer
+            logger.error(f"❌ Change stream {collection.name} indisponible: {e}")
+            return
+        except PyMongoError as e:
+            logger.warning(f"⚠️ Change stream {collection.name} interrompu, reprise: {e}")
+            await asyncio.sleep(1)
+
+
+async def watch_change_streams(db) -> None:
+    """Tâche de démarrage (EVENTS_CHANGE_STREAMS=true) : alimente le bus local depuis MongoDB"""
+    writes = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+    logger.info("📡 Événements temps réel via change streams MongoDB")
+    await asyncio.gather(
+        _watch(db.tenant_stats, writes, lambda doc: not doc.get("partial") and event_bus.publish(
+            tenant_channel(doc["_id"]), "dashboard", dashboard_payload(doc))),
+        _watch(db.subscriptions, writes, lambda doc: doc.get("username") and event_bus.publish(
+            tenant_channel(doc["username"]), "subscription", subscription_payload(doc))),
+        _watch(db.contact_messages, [{"$match": {"operationType": "insert"}}], lambda doc: event_bus.publish(
+            ADMIN_CHANNEL, "contact_message", {key: value for key, value in doc.items() if key != "_id"})),
+    )
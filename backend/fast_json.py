@@ -0,0 +1,43 @@
+"""
+Réponses JSON rapides pour les gros endpoints de liste
+FastJSONResponse sérialise directement avec orjson (datetime natif, ObjectId
+converti en chaîne) au lieu de passer chaque champ par jsonable_encoder.
+Elle doit être *retournée* par l'endpoint : FastAPI n'applique alors pas
+jsonable_encoder au contenu. Sans orjson installé, on retombe sur
+l'encodage standard de JSONResponse.
+"""
+import json
+from typing import Any
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    # Modèles Pydantic, Decimal, etc. : même rendu que FastAPI
+    return jsonable_encoder(value)
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is None:
+        # Même rendu que starlette.responses.JSONResponse.render
+        return json.dumps(
+            jsonable_encoder(content, custom_encoder={ObjectId: str}),
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,69 @@
+"""
+Indicateur is_low_stock persisté sur les articles de stock
+Le flag est recalculé dans la même écriture que la quantité (mise à jour par
+pipeline), si bien qu'il ne peut pas diverger de quantity / min_stock. Il est
+couvert par un index partiel (is_low_stock: true) : /inventory/low-stock ne
+parcourt que les articles en stock bas.
+
+Notification optionnelle quand un article passe sous son minimum :
+    LOW_STOCK_NOTIFICATIONS=true   (email à l'artisan, envoyé hors requête)
+"""
+import asyncio
+import logging
+import os
+from typing import List
+
+from email_service import send_low_stock_alert_email
+
+logger = logging.getLogger(__name__)
+
+LOW_STOCK_FILTER = {"is_low_stock": True}
+
+# Étape de pipeline recalculant le flag à partir des valeurs déjà mises à jour
+_FLAG_STAGE = {"$set": {"is_low_stock": {"$lte": ["$quantity", "$min_stock"]}}}
+
+
+def set_quantity_update(quantity: int) -> list:
+    """Pipeline d'update : quantité absolue + flag"""
+    return [{"$set": {"quantity": quantity}}, _FLAG_STAGE]
+
+
+def inc_quantity_update(delta: int) -> list:
+    """Pipeline d'update : mouvement de stock (+/-) + flag, atomique comme un $inc"""
+    return [{"$set": {"quantity": {"$add": ["$quantity", delta]}}}, _FLAG_STAGE]
+
+
+# Trace du dernier lot de mouvements sur l'article, écrite dans la même mise à
+# jour que la quantité : relue après le bulk_write, elle donne les quantités
+# exactes autour de cette écriture, même si une autre mise à jour a suivi
+MOVEMENT_FIELD = "last_movement"
+MOVEMENT_FIELDS_PROJECTION = {MOVEMENT_FIELD: 0}
+
+
+def movement_update(batch_id: str, delta: int) -> list:
+    """inc_quantity_update + trace {batch, before, after} du lot"""
+    stamp = {"batch": {"$literal": batch_id}, "before": "$quantity", "after": {"$add": ["$quantity", delta]}}
+    return [{"$set": {MOVEMENT_FIELD: stamp}}, *inc_quantity_update(delta)]
+
+
+def refresh_flag_update() -> list:
+    """Pipeline d'update recalculant seulement le flag (backfill)"""
+    return [_FLAG_STAGE]
+
+
+def notifications_enabled() -> bool:
+    return os.environ.get("LOW_STOCK_NOTIFICATIONS", "").lower() in ("1", "true", "yes")
+
+
+async def notify_low_stock(db, username: str, items: List[dict]) -> None:
+    """Envoie l'alerte stock bas à l'artisan ; les erreurs sont journalisées, jamais propagées"""
+    if not items or not notifications_enabled():
+        return
+    try:
+        user = await db.users.find_one({"username": username}, {"_id": 0, "email": 1})
+        if not user or not user.get("email"):
+            return
+        # send_email est bloquant (smtplib) : hors de la boucle d'événements
+        await asyncio.to_thread(send_low_stock_alert_email, user["email"], username, items)
+    except Exception as e:
+        logger.error(f"❌ Erreur de notification stock bas pour {username}: {e}")
@@ -0,0 +1,312 @@
+"""
+Migrations de données MongoDB (en ligne, idempotentes)
+Chaque migration traite les documents par lots et peut être relancée sans
+risque : seuls les documents pas encore migrés sont sélectionnés.
+
+Usage en ligne de commande :
+    python migrations.py backfill-email-normalized [--batch-size 500]
+    python migrations.py convert-iso-dates [--batch-size 500]
+    python migrations.py index-client-search [--batch-size 500]
+    python migrations.py flag-low-stock
+    python migrations.py backfill-updated-at
+    python migrations.py move-refresh-tokens [--batch-size 500]
+    python migrations.py hash-reset-tokens [--batch-size 500]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from client_search import SEARCHABLE_FIELDS, STALE_PREFIX_PATTERN, search_fields
+from low_stock import refresh_flag_update
+from sessions import SESSION_TTL, hash_token
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_email(email: str) -> str:
+    """Forme canonique d'un email pour les recherches (unicité insensible à la casse)"""
+    return email.strip().lower()
+
+
+async def _flush(collection, operations) -> Dict[str, int]:
+    """Exécute un lot d'UpdateOne non ordonné et compte les conflits d'unicité"""
+    if not operations:
+        return {"updated": 0, "conflicts": 0}
+    try:
+        result = await collection.bulk_write(operations, ordered=False)
+        return {"updated": result.modified_count, "conflicts": 0}
+    except BulkWriteError as bwe:
+        details = bwe.details
+        for error in details.get("writeErrors", []):
+            logger.error(f"❌ Conflit de migration: {error.get('errmsg')}")
+        return {"updated": details.get("nModified", 0), "conflicts": len(details.get("writeErrors", []))}
+
+
+async def backfill_email_normalized(db, batch_size: int = 500) -> Dict[str, int]:
+    """
+    Renseigne users.email_normalized pour les comptes créés avant son introduction.
+    Les comptes dont l'email normalisé est déjà pris (doublons de casse) sont
+    comptés en 'conflicts' et laissés tels quels pour une résolution manuelle.
+    """
+    totals = {"updated": 0, "conflicts": 0}
+    operations = []
+    cursor = db.users.find(
+        {"email_normalized": {"$exists": False}, "email": {"$type": "string"}},
+        {"_id": 1, "email": 1},
+    ).batch_size(batch_size)
+
+    async for user in cursor:
+        operations.append(UpdateOne(
+            {"_id": user["_id"]},
+            {"$set": {"email_normalized": normalize_email(user["email"])}},
+        ))
+        if len(operations) >= batch_size:
+            for key, value in (await _flush(db.users, operations)).items():
+                totals[key] += value
+            operations = []
+
+    for key, value in (await _flush(db.users, operations)).items():
+        totals[key] += value
+
+    if totals["updated"] or totals["conflicts"]:
+        logger.info(f"📧 Backfill email_normalized: {totals['updated']} mis à jour, {totals['conflicts']} conflit(s)")
+    return totals
+
+
+# Champs date historiquement stockés en chaîne ISO (.isoformat())
+ISO_DATE_FIELDS = {
+    "users": ["created_at"],
+    "quotes": ["created_at"],
+    "invoices": ["created_at", "paid_at"],
+    "inventory": ["created_at"],
+    "contact_messages": ["created_at"],
+    "subscriptions": ["created_at", "last_payment_date", "current_period_end", "updated_at", "canceled_at"],
+    "password_resets": ["expires_at"],
+}
+
+
+def _parse_iso_date(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+async def convert_iso_dates(db, batch_size: int = 500) -> Dict[str, int]:
+    """
+    Convertit en dates BSON natives les champs de ISO_DATE_FIELDS encore stockés en chaîne.
+    Seuls les documents ayant au moins un champ de type string sont lus : la
+    migration peut être interrompue et relancée, elle reprend où elle en était.
+    """
+    totals = {"updated": 0, "conflicts": 0, "invalid": 0}
+    for collection_name, fields in ISO_DATE_FIELDS.items():
+        collection = db[collection_name]
+        operations = []
+        cursor = collection.find(
+            {"$or": [{field: {"$type": "string"}} for field in fields]},
+            {field: 1 for field in fields},
+        ).batch_size(batch_size)
+
+        async for doc in cursor:
+            converted = {}
+            for field in fields:
+                if isinstance(doc.get(field), str):
+                    try:
+                        converted[field] = _parse_iso_date(doc[field])
+                    except ValueError:
+                        totals["invalid"] += 1
+                        logger.warning(f"⚠️ Date illisible {collection_name}.{field} ({doc['_id']}): {doc[field]}")
+            if converted:
+                operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": converted}))
+            if len(operations) >= batch_size:
+                for key, value in (await _flush(collection, operations)).items():
+                    totals[key] += value
+                operations = []
+
+        for key, value in (await _flush(collection, operations)).items():
+            totals[key] += value
+
+    if totals["updated"] or totals["invalid"]:
+        logger.info(f"📅 Conversion des dates ISO: {totals['updated']} document(s) mis à jour, {totals['invalid']} date(s) illisible(s)")
+    return totals
+
+
+async def index_client_search(db, batch_size: int = 500) -> Dict[str, int]:
+    """
+    Calcule search_prefixes / name_sort pour les clients créés avant la recherche
+    indexée, et recalcule ceux qui portent encore les préfixes de l'email complet
+    (inatteignables, ils ne faisaient que grossir l'index multikey)
+    """
+    totals = {"updated": 0, "conflicts": 0}
+    operations = []
+    cursor = db.clients.find(
+        {"$or": [
+            {"search_prefixes": {"$exists": False}},
+            {"search_prefixes": {"$regex": STALE_PREFIX_PATTERN}},
+        ]},
+        {field: 1 for field in SEARCHABLE_FIELDS},
+    ).batch_size(batch_size)
+
+    async for client in cursor:
+        operations.append(UpdateOne({"_id": client["_id"]}, {"$set": search_fields(client)}))
+        if len(operations) >= batch_size:
+            for key, value in (await _flush(db.clients, operations)).items():
+                totals[key] += value
+            operations = []
+
+    for key, value in (await _flush(db.clients, operations)).items():
+        totals[key] += value
+
+    if totals["updated"]:
+        logger.info(f"🔎 Index de recherche clients: {totals['updated']} client(s) indexé(s)")
+    return totals
+
+
+async def flag_low_stock(db, batch_size: int = 500) -> Dict[str, int]:
+    """Calcule inventory.is_low_stock pour les articles créés avant le flag (un seul update_many côté serveur)"""
+    result = await db.inventory.update_many({"is_low_stock": {"$exists": False}}, refresh_flag_update())
+    if result.modified_count:
+        logger.info(f"📦 Flag is_low_stock: {result.modified_count} article(s) mis à jour")
+    return {"updated": result.modified_count, "conflicts": 0}
+
+
+async def backfill_updated_at(db, batch_size: int = 500) -> Dict[str, int]:
+    """updated_at = created_at pour les documents antérieurs à la synchronisation différentielle"""
+    updated = 0
+    for collection_name in ("quotes", "invoices", "clients", "inventory"):
+        result = await db[collection_name].update_many(
+            {"updated_at": {"$exists": False}},
+            [{"$set": {"updated_at": "$created_at"}}],
+        )
+        updated += result.modified_count
+    if updated:
+        logger.info(f"🔄 Backfill updated_at: {updated} document(s) mis à jour")
+    return {"updated": updated, "conflicts": 0}
+
+
+async def move_refresh_tokens(db, batch_size: int = 500) -> Dict[str, int]:
+    """
+    Transforme les users.refresh_token historiques en sessions (les appareils
+    déjà connectés le restent), puis retire le champ et son index de users.
+    """
+    moved = 0
+    now = datetime.now(timezone.utc)
+    cursor = db.users.find(
+        {"refresh_token": {"$type": "string"}},
+        {"_id": 1, "username": 1, "refresh_token": 1},
+    ).batch_size(batch_size)
+
+    async def flush(users):
+        if not users:
+            return 0
+        await db.sessions.bulk_write([
+            UpdateOne(
+                {"_id": hash_token(user["refresh_token"])},
+                {"$setOnInsert": {
+                    "username": user["username"],
+                    "device": "",
+                    "created_at": now,
+                    "refreshed_at": now,
+                    "expires_at": now + SESSION_TTL,
+                }},
+                upsert=True,
+            )
+            for user in users
+        ], ordered=False)
+        await db.users.update_many({"_id": {"$in": [user["_id"] for user in users]}}, {"$unset": {"refresh_token": ""}})
+        return len(users)
+
+    batch = []
+    async for user in cursor:
+        batch.append(user)
+        if len(batch) >= batch_size:
+            moved += await flush(batch)
+            batch = []
+    moved += await flush(batch)
+
+    if "refresh_token" in await db.users.index_information():
+        await db.users.drop_index("refresh_token")
+    if moved:
+        logger.info(f"🔑 Refresh tokens: {moved} session(s) créée(s) depuis users")
+    return {"updated": moved, "conflicts": 0}
+
+
+async def hash_reset_tokens(db, batch_size: int = 500) -> Dict[str, int]:
+    """
+    Remplace les jetons de réinitialisation en clair par leur empreinte (les liens
+    déjà envoyés restent valides) et supprime l'ancien index (token, type).
+    """
+    totals = {"updated": 0, "conflicts": 0}
+    operations = []
+    cursor = db.password_resets.find({"token": {"$type": "string"}}, {"_id": 1, "token": 1}).batch_size(batch_size)
+
+    async for entry in cursor:
+        operations.append(UpdateOne(
+            {"_id": entry["_id"]},
+            {"$set": {"token_hash": hash_token(entry["token"])}, "$unset": {"token": ""}},
+        ))
+        if len(operations) >= batch_size:
+            for key, value in (await _flush(db.password_resets, operations)).items():
+                totals[key] += value
+            operations = []
+
+    for key, value in (await _flush(db.password_resets, operations)).items():
+        totals[key] += value
+
+    if "token_type" in await db.password_resets.index_information():
+        await db.password_resets.drop_index("token_type")
+    if totals["updated"]:
+        logger.info(f"🔑 Jetons de réinitialisation: {totals['updated']} empreinte(s) calculée(s)")
+    return totals
+
+
+async def run_online_migrations(db) -> None:
+    """Migrations lancées en tâche de fond au démarrage (no-op une fois appliquées)"""
+    for name, migration in MIGRATIONS.items():
+        try:
+            await migration(db)
+        except Exception as e:
+            logger.error(f"❌ Migration {name} interrompue: {e}")
+
+
+MIGRATIONS = {
+    "backfill-email-normalized": backfill_email_normalized,
+    "convert-iso-dates": convert_iso_dates,
+    "index-client-search": index_client_search,
+    "flag-low-stock": flag_low_stock,
+    "backfill-updated-at": backfill_updated_at,
+    "move-refresh-tokens": move_refresh_tokens,
+    "hash-reset-tokens": hash_reset_tokens,
+}
+
+
+async def _main(name: str, batch_size: int) -> int:
+    from db_connection import create_mongo_client
+
+    client = create_mongo_client(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        result = await MIGRATIONS[name](db, batch_size=batch_size)
+        print(f"{name}: {result}")
+        return 1 if result.get("conflicts") else 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Migrations de données ArtisanFlow")
+    parser.add_argument("migration", choices=sorted(MIGRATIONS))
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.migration, args.batch_size)))
@@ -0,0 +1,101 @@
+"""
+Pagination par curseur (keyset) pour les listes par artisan
+Les pages sont triées par (created_at, id) décroissants et s'appuient sur
+l'index composé (username, created_at, id) : chaque page est une lecture
+d'index bornée, quel que soit le nombre de documents de l'artisan.
+Un autre ordre (champ, id) peut être passé via `sort` : la recherche clients
+pagine ainsi sur (name_sort, id) croissants.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+PAGE_SORT = [("created_at", DESCENDING), ("id", DESCENDING)]
+SEARCH_SORT = [("name_sort", ASCENDING), ("id", ASCENDING)]
+
+
+def encode_cursor(doc: dict, sort=PAGE_SORT) -> str:
+    """Curseur opaque à partir du dernier document d'une page"""
+    key = doc.get(sort[0][0])
+    if isinstance(key, datetime):
+        payload = ["dt", key.isoformat(), doc["id"]]
+    else:
+        payload = ["str", key, doc["id"]]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[object, str]:
+    """Retourne (clé de tri, id) ; lève ValueError si le curseur est invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        kind, key, doc_id = json.loads(raw)
+    except Exception as e:
+        raise ValueError(f"Curseur invalide: {cursor}") from e
+    if kind == "dt":
+        key = datetime.fromisoformat(key)
+    elif kind != "str":
+        raise ValueError(f"Curseur invalide: {cursor}")
+    return key, doc_id
+
+
+def after_filter(cursor: str, sort=PAGE_SORT) -> dict:
+    """Condition "strictement après le curseur" dans l'ordre `sort` (par défaut (created_at, id) décroissant)"""
+    key, doc_id = decode_cursor(cursor)
+    field, direction = sort[0]
+    operator = "$lt" if direction == DESCENDING else "$gt"
+    return {"$or": [
+        {field: {operator: key}},
+        {field: key, "id": {operator: doc_id}},
+    ]}
+
+
+async def paginate(
+    collection,
+    query: dict,
+    projection: dict,
+    limit: int = DEFAULT_PAGE_SIZE,
+    after: Optional[str] = None,
+    session=None,
+    sort=PAGE_SORT,
+) -> dict:
+    """
+    Lit une page de `collection` et retourne :
+    {
+        'items': [documents],
+        'next_cursor': str | None  # None si c'est la dernière page
+    }
+    Seuls limit + 1 documents sont lus (le +1 sert à détecter la page suivante).
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if after:
+        try:
+            query = {"$and": [query, after_filter(after, sort)]}
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+
+    # Le curseur a besoin de la clé de tri et de id même si la projection les exclut
+    sort_key, hidden_key = sort[0][0], None
+    if projection and any(v for k, v in projection.items() if k != "_id"):
+        projection = {**projection, sort_key: 1, "id": 1}
+    elif projection and projection.get(sort_key) == 0:
+        # Clé de tri interne (name_sort) : lue pour le curseur, retirée des documents
+        projection = {k: v for k, v in projection.items() if k != sort_key}
+        hidden_key = sort_key
+
+    items = await collection.find(query, projection, session=session).sort(sort).limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1], sort)
+    if hidden_key:
+        for item in items:
+            item.pop(hidden_key, None)
+    return {"items": items, "next_cursor": next_cursor}
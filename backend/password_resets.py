@@ -0,0 +1,40 @@
+"""
+Jetons de réinitialisation du mot de passe et du code PIN
+Seul le SHA-256 du jeton envoyé par email est stocké (token_hash, index
+unique) ; expires_at est une date BSON, purgée par l'index TTL :
+    {"token_hash": "<sha256>", "type": "password" | "pin", "email": "...", "expires_at": ...}
+
+consume_reset_token lit et supprime l'entrée en un seul find_one_and_delete :
+un lien ne sert qu'une fois, même si deux requêtes arrivent en même temps.
+"""
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sessions import hash_token
+
+RESET_TOKEN_TTL = timedelta(hours=1)
+
+
+async def create_reset_token(db, email: str, reset_type: str) -> str:
+    """Enregistre un jeton de réinitialisation et le retourne en clair (pour le lien de l'email)"""
+    token = secrets.token_urlsafe(32)
+    await db.password_resets.insert_one({
+        "token_hash": hash_token(token),
+        "type": reset_type,
+        "email": email,
+        "expires_at": datetime.now(timezone.utc) + RESET_TOKEN_TTL,
+    })
+    return token
+
+
+async def consume_reset_token(db, token: str, reset_type: str) -> Optional[dict]:
+    """
+    Consomme le jeton : retourne l'entrée, ou None s'il est inconnu, déjà utilisé
+    ou expiré (le TTL MongoDB ne purge qu'une fois par minute).
+    """
+    return await db.password_resets.find_one_and_delete({
+        "token_hash": hash_token(token),
+        "type": reset_type,
+        "expires_at": {"$gt": datetime.now(timezone.utc)},
+    })
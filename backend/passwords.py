@@ -0,0 +1,64 @@
+"""
+Hachage des mots de passe et des codes PIN (bcrypt hors de la boucle d'événements)
+bcrypt coûte plusieurs dizaines de ms de CPU par vérification : les appels
+passent par un pool de threads borné (bcrypt libère le GIL), si bien que la
+boucle asyncio continue de servir les autres requêtes pendant un login.
+
+    PASSWORD_HASH_ROUNDS   coût bcrypt (log2 des itérations), 10 par défaut
+    PASSWORD_HASH_WORKERS  taille du pool, nombre de CPU par défaut
+
+Les empreintes SHA-256 historiques (64 caractères hexadécimaux) sont encore
+acceptées ; verify_secret signale alors needs_rehash, comme pour une empreinte
+bcrypt d'un coût différent du coût configuré, et login() la remplace.
+"""
+import asyncio
+import hashlib
+import hmac
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.environ.get("PASSWORD_HASH_ROUNDS", "10"))
+HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 4)))
+
+_LEGACY_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="kdf")
+
+
+def _bcrypt_rounds(hashed: str) -> int:
+    # Format $2b$<coût>$<sel+empreinte>
+    return int(hashed.split("$")[2])
+
+
+def hash_secret_sync(secret: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    return bcrypt.hashpw(secret.encode(), bcrypt.gensalt(rounds)).decode()
+
+
+def verify_secret_sync(secret: str, hashed: str) -> Tuple[bool, bool]:
+    """(correspond, à ré-hacher) ; une empreinte vide ou inconnue ne correspond jamais"""
+    if hashed.startswith("$2"):
+        try:
+            match = bcrypt.checkpw(secret.encode(), hashed.encode())
+        except ValueError:
+            return False, False
+        return match, match and _bcrypt_rounds(hashed) != BCRYPT_ROUNDS
+    if _LEGACY_SHA256.fullmatch(hashed):
+        legacy = hashlib.sha256(secret.encode()).hexdigest()
+        match = hmac.compare_digest(legacy, hashed)
+        return match, match
+    return False, False
+
+
+async def hash_secret(secret: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_executor, hash_secret_sync, secret)
+
+
+async def verify_secret(secret: str, hashed: str) -> Tuple[bool, bool]:
+    if not hashed.startswith("$2"):
+        # SHA-256 historique : quelques µs, inutile de passer par le pool
+        return verify_secret_sync(secret, hashed)
+    return await asyncio.get_running_loop().run_in_executor(_executor, verify_secret_sync, secret, hashed)
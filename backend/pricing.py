@@ -0,0 +1,394 @@
+"""
+Calcul exact des montants HT / TVA / TTC des devis et factures
+Les montants sont convertis une fois (via Decimal, depuis leur représentation
+texte) en entiers à échelle fixe, puis tout le calcul se fait en entiers :
+    quantités       en millièmes      (2,5 h -> 2500)
+    prix unitaires  en 1/10000 d'unité (12,345 € -> 123450)
+    taux de TVA     en millièmes de % (14,975 % -> 14975)
+    montants        en centimes
+Aucune erreur de flottant ne peut donc s'accumuler sur un devis de 10 000 lignes.
+
+Règles :
+- Chaque ligne porte son taux (item["vat_rate"]), sinon le taux du document,
+  sinon le taux normal du pays de l'artisan (VAT_RATES_BY_COUNTRY).
+- item["discount_percent"] : remise sur la ligne.
+- Lignes de remise globale : {"type": "discount", "amount": 50} (HT) ou
+  {"type": "discount", "percent": 10}. Sans vat_rate, la remise est répartie
+  entre les taux au prorata des bases (reste au plus gros), comme sur une
+  facture multi-taux.
+- HT de ligne arrondi au centime (demi supérieur) ; TVA calculée par taux sur
+  la base HT cumulée (VAT_ROUNDING_PER_RATE, usage français) ou ligne par
+  ligne (VAT_ROUNDING_PER_LINE).
+
+Mode lot : reprice_batch() recalcule des milliers de documents en un passage
+vectorisé (numpy si disponible), utilisé après un changement de taux :
+    python pricing.py reprice --country FR [--remap 5.5=6] [--batch-size 1000]
+"""
+import argparse
+import asyncio
+import logging
+import math
+import os
+import sys
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+from etags import bump_version
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy est dans requirements.txt
+    np = None
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logger = logging.getLogger(__name__)
+
+QUANTITY_SCALE = 1000
+PRICE_SCALE = 10000
+RATE_SCALE = 1000
+CENTS = 100
+
+VAT_ROUNDING_PER_RATE = "per_rate"
+VAT_ROUNDING_PER_LINE = "per_line"
+
+# Taux normal par pays (les taux réduits sont choisis ligne par ligne)
+VAT_RATES_BY_COUNTRY = {
+    "FR": Decimal("20"), "BE": Decimal("21"), "LU": Decimal("17"), "DE": Decimal("19"),
+    "IT": Decimal("22"), "ES": Decimal("21"), "NL": Decimal("21"), "AT": Decimal("20"),
+    "PT": Decimal("23"), "IE": Decimal("23"), "FI": Decimal("25.5"), "GR": Decimal("24"),
+    "CH": Decimal("8.1"), "CA": Decimal("14.975"), "GB": Decimal("20"), "US": Decimal("0"),
+}
+DEFAULT_VAT_RATE = VAT_RATES_BY_COUNTRY["FR"]
+
+
+# ============ CONVERSIONS ============
+
+# En deçà, un montant mis à l'échelle est représenté en float64 à mieux que 1e-6 près
+_FLOAT_EXACT = 2 ** 30
+
+
+def _to_scaled(value, scale: int, field: str) -> int:
+    """Valeur JSON (int, float, str) -> entier à l'échelle `scale`, arrondi au demi supérieur"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value * scale
+    if isinstance(value, float):
+        scaled = value * scale
+        # Hors d'un cas limite à ,5 (où l'erreur du flottant compte), l'arrondi direct est exact
+        if abs(scaled) < _FLOAT_EXACT and abs(abs(scaled) % 1 - 0.5) >= 1e-6:
+            return int(math.copysign(math.floor(abs(scaled) + 0.5), scaled))
+    try:
+        decimal = Decimal(str(value).replace(",", ".")) * scale
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"{field}: montant invalide ({value!r})")
+    return int(decimal.to_integral_value(rounding="ROUND_HALF_UP"))
+
+
+def _div_round(numerator: int, denominator: int) -> int:
+    """Division entière arrondie au demi supérieur (en valeur absolue)"""
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if 2 * remainder >= denominator:
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+
+def country_rate(country: Optional[str]) -> Decimal:
+    return VAT_RATES_BY_COUNTRY.get((country or "").upper(), DEFAULT_VAT_RATE)
+
+
+def cents_to_amount(cents: int) -> float:
+    """Centimes -> montant stocké (float exact au centime, compatible avec les agrégations existantes)"""
+    return cents / CENTS  # division entière -> float correctement arrondi
+
+
+def _rate_key(rate_scaled: int) -> float:
+    return rate_scaled / RATE_SCALE
+
+
+# ============ CALCUL D'UN DOCUMENT ============
+
+def _line_ht_cents(item: dict, index: int) -> int:
+    quantity = _to_scaled(item.get("quantity", 0) or 0, QUANTITY_SCALE, f"items[{index}].quantity")
+    unit_price = _to_scaled(item.get("unit_price", 0) or 0, PRICE_SCALE, f"items[{index}].unit_price")
+    ht = _div_round(quantity * unit_price, QUANTITY_SCALE * PRICE_SCALE // CENTS)
+    discount = item.get("discount_percent")
+    if discount:
+        ht -= _div_round(ht * _to_scaled(discount, RATE_SCALE, f"items[{index}].discount_percent"), 100 * RATE_SCALE)
+    return ht
+
+
+def _allocate(amount: int, bases: Dict[int, int]) -> Dict[int, int]:
+    """Répartit `amount` centimes au prorata des bases ; le reste va à la plus grosse base"""
+    total = sum(bases.values())
+    if not total:
+        return {}
+    shares = {rate: amount * base // total for rate, base in bases.items()}
+    largest = max(bases, key=lambda rate: bases[rate])
+    shares[largest] += amount - sum(shares.values())
+    return shares
+
+
+def price_document(
+    items: List[dict],
+    country: Optional[str] = None,
+    vat_rate=None,
+    vat_rounding: str = VAT_ROUNDING_PER_RATE,
+) -> dict:
+    """
+    Totaux exacts d'un devis / d'une facture :
+    {
+        'total_ht': float, 'total_vat': float, 'total_ttc': float,
+        'vat_breakdown': [{'rate': float, 'base_ht': float, 'vat': float}]
+    }
+    Lève ValueError pour une ligne invalide.
+    """
+    default_rate = _to_scaled(vat_rate if vat_rate is not None else country_rate(country), RATE_SCALE, "vat_rate")
+    bases: Dict[int, int] = {}
+    line_vat: Dict[int, int] = {}
+    discounts = []
+
+    for index, item in enumerate(items):
+        rate = _to_scaled(item["vat_rate"], RATE_SCALE, f"items[{index}].vat_rate") \
+            if item.get("vat_rate") is not None else default_rate
+        if item.get("type") == "discount":
+            discounts.append((index, item, rate if item.get("vat_rate") is not None else None))
+            continue
+        ht = _line_ht_cents(item, index)
+        bases[rate] = bases.get(rate, 0) + ht
+        line_vat[rate] = line_vat.get(rate, 0) + _div_round(ht * rate, 100 * RATE_SCALE)
+
+    for index, item, rate in discounts:
+        if item.get("percent") is not None:
+            percent = _to_scaled(item["percent"], RATE_SCALE, f"items[{index}].percent")
+            scoped = {rate: bases.get(rate, 0)} if rate is not None else dict(bases)
+            shares = {r: _div_round(base * percent, 100 * RATE_SCALE) for r, base in scoped.items()}
+        else:
+            amount = _to_scaled(item.get("amount", 0) or 0, CENTS, f"items[{index}].amount")
+            shares = {rate: amount} if rate is not None else _allocate(amount, bases)
+        for r, share in shares.items():
+            bases[r] = bases.get(r, 0) - share
+            line_vat[r] = line_vat.get(r, 0) - _div_round(share * r, 100 * RATE_SCALE)
+
+    breakdown = []
+    for rate in sorted(bases):
+        vat = _div_round(bases[rate] * rate, 100 * RATE_SCALE) \
+            if vat_rounding == VAT_ROUNDING_PER_RATE else line_vat[rate]
+        breakdown.append((rate, bases[rate], vat))
+
+    total_ht = sum(base for _, base, _ in breakdown)
+    total_vat = sum(vat for _, _, vat in breakdown)
+    return {
+        "total_ht": cents_to_amount(total_ht),
+        "total_vat": cents_to_amount(total_vat),
+        "total_ttc": cents_to_amount(total_ht + total_vat),
+        "vat_breakdown": [
+            {"rate": _rate_key(rate), "base_ht": cents_to_amount(base), "vat": cents_to_amount(vat)}
+            for rate, base, vat in breakdown
+        ],
+    }
+
+
+# ============ MODE LOT ============
+
+# Au-delà, quantité x prix pourrait dépasser un int64 : calcul en entiers Python
+_INT64_SAFE = 2 ** 62
+
+
+def _scale_column(values: list, scale: int, field: str):
+    """
+    Colonne de valeurs JSON -> int64 à l'échelle `scale`, même résultat que
+    _to_scaled valeur par valeur. Seules les valeurs ambiguës (chaînes, ou
+    partie fractionnaire à ~0,5 près d'une erreur de flottant) passent par Decimal.
+    """
+    try:
+        scaled = np.asarray(values, dtype=np.float64) * scale
+    except (TypeError, ValueError):
+        return np.asarray([_to_scaled(value, scale, field) for value in values], dtype=np.int64)
+    if scaled.size and np.abs(scaled).max() >= _FLOAT_EXACT:
+        return np.asarray([_to_scaled(value, scale, field) for value in values], dtype=np.int64)
+    result = (np.sign(scaled) * np.floor(np.abs(scaled) + 0.5)).astype(np.int64)
+    for position in np.flatnonzero(np.abs(np.abs(scaled) % 1 - 0.5) < 1e-6).tolist():
+        result[position] = _to_scaled(values[position], scale, field)
+    return result
+
+
+def _batch_numpy(documents: List[dict], default_rates: List[int]) -> Optional[List[dict]]:
+    """
+    Version vectorisée de price_document (arrondi par taux, sans lignes de remise
+    globale) : toutes les lignes de tous les documents sont traitées en une passe.
+    Retourne None si les montants risquent de déborder un int64.
+    """
+    doc_index, quantities, prices, rates, discounts = [], [], [], [], []
+    for position, document in enumerate(documents):
+        for item in document.get("items") or []:
+            doc_index.append(position)
+            quantities.append(item.get("quantity", 0) or 0)
+            prices.append(item.get("unit_price", 0) or 0)
+            rates.append(item.get("vat_rate"))
+            discounts.append(item.get("discount_percent") or 0)
+    if not doc_index:
+        return None
+
+    doc_index = np.asarray(doc_index, dtype=np.int64)
+    line_rates = _scale_column([0 if rate is None else rate for rate in rates], RATE_SCALE, "items.vat_rate")
+    rates = np.where(
+        np.asarray([rate is None for rate in rates]),
+        np.asarray(default_rates, dtype=np.int64)[doc_index],
+        line_rates,
+    )
+    quantities = _scale_column(quantities, QUANTITY_SCALE, "items.quantity")
+    prices = _scale_column(prices, PRICE_SCALE, "items.unit_price")
+    discounts = _scale_column(discounts, RATE_SCALE, "items.discount_percent")
+    if int(np.abs(quantities).max()) * int(np.abs(prices).max()) >= _INT64_SAFE:
+        return None
+
+    def div_round(numerator, denominator):
+        return np.sign(numerator) * ((2 * np.abs(numerator) + denominator) // (2 * denominator))
+
+    line_ht = div_round(quantities * prices, QUANTITY_SCALE * PRICE_SCALE // CENTS)
+    line_ht -= div_round(line_ht * discounts, 100 * RATE_SCALE)
+
+    # Une base par couple (document, taux), puis la TVA arrondie par base
+    keys, bucket = np.unique(np.stack([doc_index, rates]), axis=1, return_inverse=True)
+    bucket = bucket.reshape(-1)
+    base_ht = np.zeros(keys.shape[1], dtype=np.int64)
+    np.add.at(base_ht, bucket, line_ht)
+    base_vat = div_round(base_ht * keys[1], 100 * RATE_SCALE)
+
+    totals = [[0, 0, []] for _ in documents]
+    for position, rate, base, vat in zip(keys[0].tolist(), keys[1].tolist(), base_ht.tolist(), base_vat.tolist()):
+        total = totals[position]
+        total[0] += base
+        total[1] += vat
+        total[2].append({"rate": _rate_key(rate), "base_ht": cents_to_amount(base), "vat": cents_to_amount(vat)})
+    return [{
+        "total_ht": cents_to_amount(ht),
+        "total_vat": cents_to_amount(vat),
+        "total_ttc": cents_to_amount(ht + vat),
+        "vat_breakdown": breakdown,
+    } for ht, vat, breakdown in totals]
+
+
+def remap_rates(items: List[dict], remap: Dict[Decimal, Decimal]) -> List[dict]:
+    """Remplace les taux de ligne listés dans `remap` (ancien -> nouveau)"""
+    by_value = {float(old): float(new) for old, new in remap.items()}
+    return [
+        {**item, "vat_rate": by_value[float(item["vat_rate"])]}
+        if item.get("vat_rate") is not None and float(item["vat_rate"]) in by_value else item
+        for item in items
+    ]
+
+
+def reprice_batch(documents: List[dict], country_by_document: Optional[List[Optional[str]]] = None,
+                  remap: Optional[Dict[Decimal, Decimal]] = None) -> List[dict]:
+    """
+    Recalcule les totaux de nombreux documents en une passe ; même résultat que
+    price_document document par document. `remap` remplace des taux de ligne
+    (ex. {Decimal("5.5"): Decimal("6")}) avant le calcul.
+    """
+    countries = country_by_document or [None] * len(documents)
+    if remap:
+        documents = [{**document, "items": remap_rates(document.get("items") or [], remap)} for document in documents]
+
+    default_rates = [
+        _to_scaled(document.get("vat_rate") if document.get("vat_rate") is not None else country_rate(country),
+                   RATE_SCALE, "vat_rate")
+        for document, country in zip(documents, countries)
+    ]
+    simple = [
+        position for position, document in enumerate(documents)
+        if not any(item.get("type") == "discount" for item in document.get("items") or [])
+    ]
+    results: List[Optional[dict]] = [None] * len(documents)
+    if np is not None and simple:
+        vectorized = _batch_numpy([documents[p] for p in simple], [default_rates[p] for p in simple])
+        for position, result in zip(simple, vectorized or ()):
+            results[position] = result
+    for position, document in enumerate(documents):
+        if results[position] is None:
+            results[position] = price_document(document.get("items") or [], vat_rate=Decimal(default_rates[position]) / RATE_SCALE)
+    return results
+
+
+async def reprice_draft_quotes(db, country: str, remap: Optional[Dict[Decimal, Decimal]] = None,
+                               batch_size: int = 1000) -> int:
+    """
+    Recalcule les devis en brouillon des artisans d'un pays (après un changement de taux).
+    updated_at et la version quotes de chaque artisan touché sont mis à jour à
+    chaque lot : /sync renvoie les devis recalculés et les ETags sont invalidés.
+    """
+    # Même résolution que compute_totals : country, sinon countryCode (inscription)
+    usernames = await db.users.distinct("username", {"$or": [
+        {"country": country.upper()},
+        {"country": {"$in": [None, ""]}, "countryCode": country.upper()},
+    ]})
+    updated = 0
+    cursor = db.quotes.find(
+        {"username": {"$in": usernames}, "status": "draft"},
+        {"_id": 1, "username": 1, "items": 1, "vat_rate": 1},
+    ).batch_size(batch_size)
+
+    async def flush(batch: List[dict]) -> int:
+        if not batch:
+            return 0
+        totals = reprice_batch(batch, [country] * len(batch))
+        now = datetime.now(timezone.utc)
+        operations = [
+            UpdateOne({"_id": document["_id"]}, {"$set": {**result, "items": document["items"], "updated_at": now}})
+            for document, result in zip(batch, totals)
+        ]
+        result = await db.quotes.bulk_write(operations, ordered=False)
+        for username in {document["username"] for document in batch}:
+            await bump_version(db, username, "quotes")
+        return result.modified_count
+
+    batch: List[dict] = []
+    async for quote in cursor:
+        if remap:
+            quote["items"] = remap_rates(quote.get("items") or [], remap)
+        batch.append(quote)
+        if len(batch) >= batch_size:
+            updated += await flush(batch)
+            batch = []
+    updated += await flush(batch)
+    logger.info(f"💶 {updated} devis en brouillon recalculé(s) pour {country.upper()}")
+    return updated
+
+
+def parse_remap(values: Iterable[str]) -> Dict[Decimal, Decimal]:
+    """["5.5=6", "10=12"] -> {Decimal('5.5'): Decimal('6'), ...}"""
+    remap = {}
+    for value in values:
+        old, new = value.split("=", 1)
+        remap[Decimal(old)] = Decimal(new)
+    return remap
+
+
+async def _main(country: str, remap: Dict[Decimal, Decimal], batch_size: int) -> int:
+    from db_connection import create_mongo_client
+
+    client = create_mongo_client(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        updated = await reprice_draft_quotes(db, country, remap, batch_size)
+        print(f"reprice {country}: {updated} devis")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Recalcul des devis ArtisanFlow")
+    parser.add_argument("command", choices=["reprice"])
+    parser.add_argument("--country", required=True)
+    parser.add_argument("--remap", action="append", default=[], help="ancien=nouveau taux de ligne, ex. 5.5=6")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.country, parse_remap(args.remap), args.batch_size)))
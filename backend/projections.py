@@ -0,0 +1,71 @@
+"""
+Projections des endpoints de lecture (paramètre fields=)
+Chaque collection expose une liste blanche de champs ; ?fields=a,b,c est
+traduit en projection MongoDB, si bien que seuls ces champs quittent le
+serveur de base de données. Sans fields=, les listes utilisent une projection
+"slim" pour les devis et factures : pas de tableau items complet, seulement
+son nombre (items_count, calculé côté MongoDB par $size).
+"""
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+# Champs calculés disponibles dans fields=
+COMPUTED_FIELDS = {
+    "items_count": {"$size": {"$ifNull": ["$items", []]}},
+}
+
+FIELD_WHITELIST = {
+    "quotes": {
+        "id", "client_name", "client_email", "description", "items", "items_count",
+        "status", "invoice_id", "vat_rate", "total_ht", "total_vat", "total_ttc", "vat_breakdown",
+        "created_at", "updated_at",
+    },
+    "invoices": {
+        "id", "quote_id", "client_name", "client_email", "description", "items", "items_count",
+        "status", "vat_rate", "total_ht", "total_vat", "total_ttc", "vat_breakdown", "paid_at",
+        "created_at", "updated_at",
+    },
+    "clients": {
+        "id", "name", "email", "phone", "address", "city", "postal_code", "notes",
+        "created_at", "updated_at",
+    },
+    "inventory": {
+        "id", "name", "reference", "quantity", "unit_price", "min_stock", "category",
+        "is_low_stock", "created_at", "updated_at",
+    },
+}
+
+
+def _projection(fields) -> Dict[str, object]:
+    projection: Dict[str, object] = {"_id": 0}
+    for field in fields:
+        projection[field] = COMPUTED_FIELDS.get(field, 1)
+    return projection
+
+
+# Projections slim par défaut des listes de devis et de factures
+QUOTE_LIST_PROJECTION = _projection((
+    "id", "client_name", "client_email", "description", "items_count",
+    "status", "invoice_id", "total_ht", "total_ttc", "created_at",
+))
+INVOICE_LIST_PROJECTION = _projection((
+    "id", "quote_id", "client_name", "client_email", "description", "items_count",
+    "status", "total_ht", "total_ttc", "paid_at", "created_at",
+))
+
+
+def read_projection(collection: str, fields: Optional[str], default: Dict[str, object]) -> Dict[str, object]:
+    """
+    Projection pour ?fields= (liste séparée par des virgules), `default` sans fields=.
+    Lève HTTPException 400 pour un champ hors liste blanche.
+    """
+    if not fields:
+        return default
+    whitelist = FIELD_WHITELIST[collection]
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in whitelist]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Champ(s) inconnu(s): {', '.join(unknown)}")
+    # id toujours renvoyé : le frontend indexe tout par id
+    return _projection(dict.fromkeys(["id", *requested]))
@@ -0,0 +1,211 @@
+"""
+Limitation de débit des endpoints d'authentification et publics
+Fenêtre glissante approchée par deux compteurs fixes : pour une fenêtre W,
+    estimation = précédent * (1 - fraction écoulée de la fenêtre courante) + courant
+Chaque clé (règle, IP ou identifiant) tient en trois entiers, ce qui borne la
+mémoire même sous un burst de credential stuffing.
+
+La dépendance rate_limited(...) s'exécute avant le handler : une requête refusée
+reçoit 429 + Retry-After sans lecture MongoDB ni calcul bcrypt. L'identifiant
+(email du corps JSON) est limité en plus de l'IP, pour qu'un attaquant
+distribué ne puisse pas cibler un compte depuis de nombreuses adresses.
+
+    RATE_LIMIT_BACKEND=memory   compteurs du processus (par défaut)
+    RATE_LIMIT_BACKEND=mongo    compteurs partagés entre workers (collection
+                                rate_limits, purgée par index TTL)
+    RATE_LIMIT_TRUST_PROXY=true IP client lue dans X-Forwarded-For (un seul
+                                proxy de confiance devant l'application)
+"""
+import logging
+import math
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+IP = "ip"
+SWEEP_INTERVAL = 60
+
+
+class Rule:
+    """`limit` requêtes par `window` secondes, par IP ou par champ du corps JSON (`scope`)"""
+
+    __slots__ = ("name", "limit", "window", "scope")
+
+    def __init__(self, name: str, limit: int, window: int, scope: str = IP):
+        self.name, self.limit, self.window, self.scope = name, limit, window, scope
+
+
+def _estimate(prev: int, curr: int, fraction: float) -> float:
+    return prev * (1 - fraction) + curr
+
+
+def _retry_after(rule: Rule, prev: int, curr: int, now: float) -> int:
+    """Secondes avant qu'une requête de plus tienne dans la limite (estimation + 1 <= limit)"""
+    window_start = math.floor(now / rule.window) * rule.window
+    if curr + 1 > rule.limit:
+        # Il faut attendre la fenêtre suivante, où curr devient le compteur précédent
+        wait = window_start + rule.window - now + rule.window * (1 - (rule.limit - 1) / curr)
+    else:
+        # curr + 1 <= limit : le dépassement vient du compteur précédent (prev > 0)
+        wait = window_start + rule.window * (1 - (rule.limit - curr - 1) / prev) - now
+    return max(1, math.ceil(wait))
+
+
+# ============ BACKEND EN MÉMOIRE ============
+
+class MemoryLimiter:
+    """Compteurs du processus : {(règle, clé): [index de fenêtre, précédent, courant]}"""
+
+    def __init__(self):
+        self._counters: Dict[Tuple[str, str], List[int]] = {}
+        self._windows: Dict[str, int] = {}
+        self._last_sweep = time.monotonic()
+
+    def _counts(self, rule: Rule, key: str, now: float) -> Tuple[int, int]:
+        index = int(now // rule.window)
+        counter = self._counters.get((rule.name, key))
+        if counter is None or counter[0] < index - 1:
+            return 0, 0
+        if counter[0] == index - 1:
+            return counter[2], 0
+        return counter[1], counter[2]
+
+    def _record(self, rule: Rule, key: str, now: float) -> None:
+        index = int(now // rule.window)
+        prev, curr = self._counts(rule, key, now)
+        self._counters[(rule.name, key)] = [index, prev, curr + 1]
+
+    def _sweep(self, now: float) -> None:
+        """Oublie les clés dont les deux fenêtres sont écoulées"""
+        if time.monotonic() - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = time.monotonic()
+        stale = [
+            key for key, (index, _, _) in self._counters.items()
+            if index < int(now // self._windows[key[0]]) - 1
+        ]
+        for key in stale:
+            del self._counters[key]
+
+    async def hit(self, checks: List[Tuple[Rule, str]]) -> Optional[int]:
+        """Compte la requête si toutes les règles l'acceptent, sinon retourne Retry-After"""
+        now = time.time()
+        self._sweep(now)
+        retry_after = None
+        for rule, key in checks:
+            prev, curr = self._counts(rule, key, now)
+            fraction = (now % rule.window) / rule.window
+            if _estimate(prev, curr, fraction) + 1 > rule.limit:
+                retry_after = max(retry_after or 0, _retry_after(rule, prev, curr, now))
+        if retry_after is not None:
+            return retry_after
+        for rule, key in checks:
+            self._windows[rule.name] = rule.window
+            self._record(rule, key, now)
+        return None
+
+
+# ============ BACKEND MONGODB (MULTI-WORKERS) ============
+
+class MongoLimiter:
+    """
+    Compteurs partagés : un document par (règle, clé, fenêtre), $inc atomique.
+    Toute tentative est comptée, y compris refusée : un client qui insiste
+    prolonge son propre blocage.
+    """
+
+    def __init__(self, db):
+        self._db = db
+
+    async def hit(self, checks: List[Tuple[Rule, str]]) -> Optional[int]:
+        now = time.time()
+        retry_after = None
+        for rule, key in checks:
+            index = int(now // rule.window)
+            current = await self._db.rate_limits.find_one_and_update(
+                {"_id": f"{rule.name}:{key}:{index}"},
+                {
+                    "$inc": {"count": 1},
+                    "$setOnInsert": {"expires_at": datetime.now(timezone.utc) + timedelta(seconds=2 * rule.window)},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            previous = await self._db.rate_limits.find_one({"_id": f"{rule.name}:{key}:{index - 1}"})
+            prev, curr = (previous or {}).get("count", 0), current["count"]
+            fraction = (now % rule.window) / rule.window
+            # curr inclut déjà la requête courante
+            if _estimate(prev, curr, fraction) > rule.limit:
+                retry_after = max(retry_after or 0, _retry_after(rule, prev, curr, now))
+        return retry_after
+
+
+# ============ DÉPENDANCE FASTAPI ============
+
+_limiter = None
+
+
+def configure_rate_limiter(db) -> None:
+    """Choisit le backend au démarrage selon RATE_LIMIT_BACKEND"""
+    global _limiter
+    if os.environ.get("RATE_LIMIT_BACKEND", "memory").lower() == "mongo":
+        _limiter = MongoLimiter(db)
+        logger.info("🚦 Limitation de débit partagée via MongoDB")
+    else:
+        _limiter = MemoryLimiter()
+
+
+def client_ip(request: Request) -> str:
+    if os.environ.get("RATE_LIMIT_TRUST_PROXY", "").lower() in ("1", "true", "yes"):
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            # Dernière adresse : celle ajoutée par le proxy, les précédentes viennent du client
+            return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def rate_limited(*rules: Rule):
+    """Dépendance de route : 429 + Retry-After si l'une des règles est dépassée"""
+
+    async def dependency(request: Request) -> None:
+        global _limiter
+        if _limiter is None:
+            _limiter = MemoryLimiter()
+        body = None
+        checks = []
+        for rule in rules:
+            if rule.scope == IP:
+                checks.append((rule, client_ip(request)))
+                continue
+            if body is None:
+                # Corps déjà lu et mis en cache par FastAPI pour le modèle du handler
+                try:
+                    body = await request.json()
+                except ValueError:
+                    body = {}
+            value = body.get(rule.scope) if isinstance(body, dict) else None
+            if isinstance(value, str) and value.strip():
+                checks.append((rule, value.strip().lower()))
+        retry_after = await _limiter.hit(checks)
+        if retry_after is not None:
+            logger.warning(f"🚦 {request.url.path}: limite atteinte pour {client_ip(request)}, réessai dans {retry_after}s")
+            raise HTTPException(
+                status_code=429,
+                detail="Trop de tentatives. Veuillez réessayer plus tard.",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+    return dependency
+
+
+# Règles des endpoints sensibles (IP, puis email du corps)
+LOGIN_LIMITS = (Rule("login-ip", 20, 60), Rule("login-email", 5, 60, "email"))
+FORGOT_LIMITS = (Rule("forgot-ip", 5, 600), Rule("forgot-email", 3, 3600, "email"))
+REGISTER_LIMITS = (Rule("register-ip", 5, 3600),)
+CONTACT_LIMITS = (Rule("contact-ip", 5, 3600), Rule("contact-email", 3, 3600, "email"))
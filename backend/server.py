@@ -1,8 +1,22 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Request, UploadFile, File, Query, BackgroundTasks, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse 
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi.responses import JSONResponse, StreamingResponse
+from fast_json import FastJSONResponse
+from db_connection import create_mongo_client, read_only_preference, mongo_client_options, pool_metrics
+from bulk_import import detect_format, iter_rows, import_rows
+from client_search import search_fields, search_filter, SEARCH_FIELDS_PROJECTION
+from events import (
+    ADMIN_CHANNEL, tenant_channel, publish_event, publish_subscription_change,
+    sse_stream, change_streams_enabled, watch_change_streams,
+)
+from sync import sync_changes, record_tombstone, DEFAULT_SYNC_LIMIT, MAX_SYNC_LIMIT
+from etags import bump_version, resource_etag, not_modified, with_etag
+from low_stock import (
+    LOW_STOCK_FILTER, MOVEMENT_FIELD, MOVEMENT_FIELDS_PROJECTION,
+    set_quantity_update, movement_update, notify_low_stock,
+)
 from pymongo.errors import DuplicateKeyError # Added for robust DB handling
+from pymongo import UpdateOne
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
 from typing import Optional, List
 from datetime import datetime, timezone, timedelta
@@ -10,14 +24,13 @@ from dotenv import load_dotenv
 from pathlib import Path
 import os
 import logging
-import secrets
-import hashlib
 import stripe
 import json
 import base64
 import httpx
 import re
 import uuid
+import asyncio
 
 # IMPORTANT: Load .env BEFORE importing vat_validator
 ROOT_DIR = Path(__file__).parent
@@ -29,11 +42,29 @@ from vat_validator import vat_validator
 # IMPORTANT: Import email_service AFTER loading .env to ensure it gets the variables
 # IMPORTANT: Import email_service AFTER loading .env to ensure it gets the variables
 from email_service import send_registration_confirmation_email, send_contact_notification_email, DEV_MODE as EMAIL_DEV_MODE
+from db_indexes import ensure_indexes, verify_index_coverage
+from migrations import normalize_email, run_online_migrations
+from pagination import paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, SEARCH_SORT
+from pricing import price_document
+from passwords import hash_secret, verify_secret
+from rate_limit import (
+    configure_rate_limiter, rate_limited, LOGIN_LIMITS, FORGOT_LIMITS, REGISTER_LIMITS, CONTACT_LIMITS,
+)
+from auth_tokens import issue_access_token, authorize_tenant, require_admin
+from password_resets import create_reset_token, consume_reset_token
+from sessions import create_session, consume_session, revoke_session, revoke_user_sessions, device_label
+from projections import read_projection, QUOTE_LIST_PROJECTION, INVOICE_LIST_PROJECTION
+from tenant_stats import (
+    apply_stats_delta, get_tenant_stats, reconcile_periodically, DEFAULT_RECONCILE_INTERVAL,
+    quote_status_delta, invoice_status_delta, inventory_delta, is_low_stock,
+)
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = create_mongo_client(mongo_url)
 db = client[os.environ['DB_NAME']]
+# Chemin lecture seule (listes, tableau de bord) : MONGO_READ_PREFERENCE, primary par défaut (secondaires en opt-in)
+read_db = client.get_database(os.environ['DB_NAME'], read_preference=read_only_preference())
 
 # Stripe configuration
 stripe.api_key = os.environ['STRIPE_SECRET_KEY']
@@ -47,18 +78,37 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 # Create the main app
 app = FastAPI()
-api_router = APIRouter(prefix="/api")
+# Toute route portant `username` (chemin ou query) exige un jeton de cet artisan
+api_router = APIRouter(prefix="/api", dependencies=[Depends(authorize_tenant)])
 
 # Startup Event to Log Email Mode
 @app.on_event("startup")
 async def startup_event():
     logger.info("🚀 Server starting...")
+    configure_rate_limiter(db)
     if EMAIL_DEV_MODE:
         logger.warning("⚠️  EMAIL SERVICE: RUNNING IN **DEV MODE** (Emails will be simulated)")
         logger.warning("    -> Check SMTP_USERNAME and SMTP_PASSWORD in environment variables.")
     else:
         logger.info("📧 EMAIL SERVICE: RUNNING IN **PRODUCTION MODE** (Emails will be sent via AWS SES)")
 
+    # Index MongoDB : création idempotente + rapport de drift
+    await ensure_indexes(db)
+    # Mode self-check : refuser de démarrer si une requête critique fait un COLLSCAN
+    if os.environ.get('MONGO_INDEX_SELF_CHECK', '').lower() in ('1', 'true', 'yes'):
+        failures = await verify_index_coverage(db)
+        if failures:
+            raise RuntimeError(f"Index self-check failed: {len(failures)} requête(s) en COLLSCAN")
+    # Migrations en ligne : email_normalized, dates ISO -> BSON (no-op une fois appliquées)
+    asyncio.create_task(run_online_migrations(db))
+    # Réconciliation périodique des compteurs du tableau de bord (toutes les heures par défaut, 0 : désactivée)
+    reconcile_interval = int(os.environ.get('TENANT_STATS_RECONCILE_INTERVAL', str(DEFAULT_RECONCILE_INTERVAL)))
+    if reconcile_interval > 0:
+        asyncio.create_task(reconcile_periodically(db, reconcile_interval))
+    # Événements SSE partagés entre workers via les change streams (désactivé par défaut)
+    if change_streams_enabled():
+        asyncio.create_task(watch_change_streams(db))
+
 # CORS Configuration - CRITICAL FIX
 origins = [
     "http://localhost:3000",
@@ -99,17 +149,8 @@ COUNTRY_TO_CURRENCY = {
 }
 
 # Helpers
-def hash_password(pw: str):
-    return hashlib.sha256(pw.encode()).hexdigest()
-
-def verify_password(pw: str, hashed: str):
-    return hash_password(pw) == hashed
-
-def make_access_token(username: str):
-    return secrets.token_hex(32)
-
-def make_refresh_token(username: str):
-    return secrets.token_hex(40)
+def make_access_token(username: str, is_admin: bool = False):
+    return issue_access_token(username, is_admin)
 
 # ============ MODELS ============
 
@@ -173,6 +214,7 @@ class User(BaseModel):
     countryCode: str
     profession: Optional[str] = None  # Métier de l'artisan
     professionOther: Optional[str] = None  # Si "Autre" est sélectionné
+    email_normalized: Optional[str] = None  # Email en minuscules, clé de recherche unique
     stripe_customer_id: str
     vatNumber: Optional[str] = None  # VAT/TVA number (unique per company)
     gstNumber: Optional[str] = None  # TPS/GST pour Québec
@@ -180,7 +222,6 @@ class User(BaseModel):
     vat_verified_company_name: Optional[str] = None  # From VIES/UID
     vat_verified_address: Optional[str] = None  # From VIES/UID
     stripe_card_fingerprint: Optional[str] = None # Unique card fingerprint to prevent duplicates
-    refresh_token: Optional[str] = None
     is_admin: bool = False  # Flag pour identifier les administrateurs
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -220,20 +261,37 @@ class InventoryItem(InventoryItemCreate):
     username: str
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda data: data["created_at"])
+    is_low_stock: bool = False
+
+    def model_post_init(self, __context):
+        self.is_low_stock = self.quantity <= self.min_stock
+
+class StockMovementCreate(BaseModel):
+    item_id: str
+    delta: int  # +entrée / -sortie de stock
+    reason: Optional[str] = None
+
+class StockMovementBatch(BaseModel):
+    movements: List[StockMovementCreate] = Field(..., min_length=1, max_length=1000)
 
 class QuoteCreate(BaseModel):
     client_name: str
     client_email: Optional[EmailStr] = None
     description: str
     items: List[dict]
+    vat_rate: Optional[float] = None  # taux par défaut des lignes sans vat_rate (sinon taux du pays)
 
 class Quote(QuoteCreate):
     username: str
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     status: str = "draft"
     total_ht: float
+    total_vat: float = 0
     total_ttc: float
+    vat_breakdown: List[dict] = []
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda data: data["created_at"])
 
 class InvoiceCreate(BaseModel):
     quote_id: Optional[str] = None
@@ -241,15 +299,19 @@ class InvoiceCreate(BaseModel):
     client_email: Optional[EmailStr] = None
     description: str
     items: List[dict]
+    vat_rate: Optional[float] = None
 
 class Invoice(InvoiceCreate):
     username: str
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     status: str = "unpaid"
     total_ht: float
+    total_vat: float = 0
     total_ttc: float
+    vat_breakdown: List[dict] = []
     paid_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda data: data["created_at"])
 
 class ContactMessageCreate(BaseModel):
     name: str
@@ -264,22 +326,55 @@ class ContactMessage(ContactMessageCreate):
 
 # ... (omitted classes)
 
-@api_router.post("/auth/register")
-async def register(request: RegisterRequest):
+def clean_business_identifier(value: Optional[str]) -> Optional[str]:
+    # STRICT CLEANING: Remove all spaces, dashes, dots
+    if not value:
+        return None
+    return value.replace(" ", "").replace("-", "").replace(".", "").upper()
+
+async def find_identifier_conflicts(identifiers: dict) -> dict:
+    """
+    Vérifie en un seul aller-retour MongoDB ($or sur des champs indexés) quels
+    identifiants sont déjà utilisés. Les valeurs vides sont ignorées.
+    Retourne {champ: username du compte existant} pour chaque collision.
+    """
+    clauses = [{field: value} for field, value in identifiers.items() if value]
+    if not clauses:
+        return {}
+
+    projection = {"_id": 0, "username": 1, **{field: 1 for field in identifiers}}
+    matches = await db.users.find({"$or": clauses}, projection).to_list(None)
+
+    conflicts = {}
+    for user in matches:
+        for field, value in identifiers.items():
+            if value and field not in conflicts and user.get(field) == value:
+                conflicts[field] = user.get("username")
+    return conflicts
+
+@api_router.post("/auth/register", dependencies=[Depends(rate_limited(*REGISTER_LIMITS))])
+async def register(request: RegisterRequest, http_request: Request):
     try:
         # Check if user exists - ALWAYS enforce (all countries)
-        # Strict case-insensitive email check
-        existing_user = await db.users.find_one({"email": {"$regex": f"^{re.escape(request.email)}$", "$options": "i"}})
-        if existing_user:
+        # Email (insensible à la casse), username, mobile, TVA et TPS vérifiés en une seule requête
+        vat_clean = clean_business_identifier(request.vatNumber)
+        gst_clean = clean_business_identifier(request.gstNumber)
+        conflicts = await find_identifier_conflicts({
+            "email_normalized": normalize_email(request.email),
+            "username": request.username,
+            "mobile": request.mobile,
+            "vatNumber": vat_clean,
+            "gstNumber": gst_clean,
+        })
+
+        if "email_normalized" in conflicts:
             raise HTTPException(status_code=409, detail="Un compte existe déjà avec cet email.")
         
-        existing_username = await db.users.find_one({"username": request.username})
-        if existing_username:
+        if "username" in conflicts:
             raise HTTPException(status_code=409, detail="Ce nom d'utilisateur est déjà pris.")
         
         # Check if mobile exists
-        existing_mobile = await db.users.find_one({"mobile": request.mobile})
-        if existing_mobile:
+        if "mobile" in conflicts:
             raise HTTPException(status_code=409, detail="Ce numéro de mobile est déjà associé à un compte.")
 
         # Validate PIN format (4 digits)
@@ -291,13 +386,10 @@ async def register(request: RegisterRequest):
         logger.info(f"🔍 Validating business identifiers before Stripe creation for {request.email}")
 
         # 1️⃣ CHECK VAT UNIQUENESS - One company can only register once
-        if request.vatNumber:
-            # STRICT CLEANING: Remove all spaces, dashes, dots
-            vat_clean = request.vatNumber.replace(" ", "").replace("-", "").replace(".", "").upper()
+        if vat_clean:
             logger.info(f"Checking VAT Uniqueness for clean value: {vat_clean}")
-            existing_vat = await db.users.find_one({"vatNumber": vat_clean}, {"_id": 0})
-            if existing_vat:
-                logger.warning(f"⚠️ VAT number {vat_clean} already registered by user {existing_vat.get('username')}")
+            if "vatNumber" in conflicts:
+                logger.warning(f"⚠️ VAT number {vat_clean} already registered by user {conflicts['vatNumber']}")
                 raise HTTPException(
                     status_code=409, 
                     detail=f"Ce numéro de TVA ({vat_clean}) est déjà enregistré dans notre système. Une entreprise ne peut créer qu'un seul compte."
@@ -305,12 +397,10 @@ async def register(request: RegisterRequest):
             logger.info(f"✅ VAT number {vat_clean} is unique")
 
         # 2️⃣ CHECK GST/NEQ UNIQUENESS (Canada)
-        if request.gstNumber:
-            gst_clean = request.gstNumber.replace(" ", "").replace("-", "").replace(".", "").upper()
+        if gst_clean:
             logger.info(f"Checking GST Uniqueness for clean value: {gst_clean}")
-            existing_gst = await db.users.find_one({"gstNumber": gst_clean}, {"_id": 0})
-            if existing_gst:
-                logger.warning(f"⚠️ GST number {gst_clean} already registered by user {existing_gst.get('username')}")
+            if "gstNumber" in conflicts:
+                logger.warning(f"⚠️ GST number {gst_clean} already registered by user {conflicts['gstNumber']}")
                 raise HTTPException(
                     status_code=409, 
                     detail=f"Ce numéro d'entreprise/TPS ({gst_clean}) est déjà enregistré dans notre système."
@@ -375,8 +465,8 @@ async def register(request: RegisterRequest):
                 logger.info(f"Checking Card Uniqueness for fingerprint: {fingerprint}")
                 
                 # Strict uniqueness check on card
-                existing_card_user = await db.users.find_one({"stripe_card_fingerprint": fingerprint})
-                if existing_card_user:
+                card_conflicts = await find_identifier_conflicts({"stripe_card_fingerprint": fingerprint})
+                if card_conflicts:
                      logger.warning(f"Registration blocked: Duplicate card fingerprint {fingerprint}")
                      raise HTTPException(
                          status_code=409, 
@@ -566,8 +656,9 @@ async def register(request: RegisterRequest):
 
         # Create user in DB
         logger.info(f"Creating user in database for {request.email}")
-        password_hash = hash_password(request.password)
-        pin_hash = hash_password(request.pin)  # Hash PIN like password
+        password_hash, pin_hash = await asyncio.gather(  # PIN haché comme le mot de passe
+            hash_secret(request.password), hash_secret(request.pin)
+        )
         
         # Prepare VAT status based on validation
         vat_status = "pending"
@@ -583,6 +674,7 @@ async def register(request: RegisterRequest):
         
         user = User(
             email=request.email,
+            email_normalized=normalize_email(request.email),
             username=request.username,
             password_hash=password_hash,
             pin_hash=pin_hash,
@@ -594,7 +686,7 @@ async def register(request: RegisterRequest):
             profession=request.profession,
             professionOther=request.professionOther,
             stripe_customer_id=customer_id,
-            vatNumber=request.vatNumber.replace(" ", "").replace("-", "").replace(".", "").upper() if request.vatNumber else None,
+            vatNumber=vat_clean,
             gstNumber=request.gstNumber if country == "CA" else None,
             vat_verification_status=vat_status,
             vat_verified_company_name=vat_company_name,
@@ -603,7 +695,6 @@ async def register(request: RegisterRequest):
         )
         
         user_dict = user.model_dump()
-        user_dict['created_at'] = user_dict['created_at'].isoformat()
         
         try:
             await db.users.insert_one(user_dict)
@@ -624,18 +715,14 @@ async def register(request: RegisterRequest):
             "price_id": price_id,  # Store the Price ID used
             "failures": 0,
             "is_active": True,
-            "created_at": datetime.now(timezone.utc).isoformat(),
+            "created_at": datetime.now(timezone.utc),
         }
         await db.subscriptions.insert_one(subscription_record)
         logger.info(f"Subscription record created: {subscription_id} for user {request.username} with Price ID {price_id}")
 
         # Generate tokens
         access_token = make_access_token(request.username)
-        refresh_token = make_refresh_token(request.username)
-        await db.users.update_one(
-            {"username": request.username},
-            {"$set": {"refresh_token": refresh_token}}
-        )
+        refresh_token = await create_session(db, request.username, device=device_label(http_request))
 
         # Envoyer l'email de confirmation d'inscription
         try:
@@ -683,22 +770,18 @@ async def register(request: RegisterRequest):
             content={"detail": "Une erreur interne inattendue est survenue. Veuillez contacter le support."}
         )
 
-@api_router.post("/auth/login")
-async def login(req: LoginRequest):
+@api_router.post("/auth/login", dependencies=[Depends(rate_limited(*LOGIN_LIMITS))])
+async def login(req: LoginRequest, request: Request):
     logger.info(f"🔍 LOGIN ATTEMPT: email={req.email}")
-    user = await db.users.find_one({"email": req.email})
+    user = await db.users.find_one({"email_normalized": normalize_email(req.email)})
     if not user:
         logger.warning(f"❌ User not found: {req.email}")
         raise HTTPException(status_code=401, detail="Email, mot de passe ou PIN incorrect.")
     
     logger.info(f"✅ User found: {user.get('username')}")
-    logger.info(f"🔑 Stored password_hash: {user.get('password_hash')[:20]}...")
-    logger.info(f"🔑 Stored pin_hash: {user.get('pin_hash')[:20]}...")
-    
-    # Verify password
-    calculated_password_hash = hash_password(req.password)
-    logger.info(f"🔑 Calculated password_hash: {calculated_password_hash[:20]}...")
-    password_match = verify_password(req.password, user["password_hash"])
+
+    # Verify password (bcrypt dans le pool de hachage, la boucle reste libre)
+    password_match, password_rehash = await verify_secret(req.password, user.get("password_hash", ""))
     logger.info(f"🔐 Password match: {password_match}")
     
     if not password_match:
@@ -706,21 +789,26 @@ async def login(req: LoginRequest):
         raise HTTPException(status_code=401, detail="Email, mot de passe ou PIN incorrect.")
     
     # Verify PIN
-    calculated_pin_hash = hash_password(req.pin)
-    logger.info(f"🔑 Calculated pin_hash: {calculated_pin_hash[:20]}...")
-    pin_match = verify_password(req.pin, user.get("pin_hash", ""))
+    pin_match, pin_rehash = await verify_secret(req.pin, user.get("pin_hash", ""))
     logger.info(f"🔐 PIN match: {pin_match}")
     
     if not pin_match:
         logger.warning(f"❌ PIN mismatch for {req.email}")
         raise HTTPException(status_code=401, detail="Email, mot de passe ou PIN incorrect.")
 
-    access_token = make_access_token(user["username"])
-    refresh_token = make_refresh_token(user["username"])
-    await db.users.update_one(
-        {"username": user["username"]},
-        {"$set": {"refresh_token": refresh_token}}
-    )
+    # Empreinte SHA-256 historique ou coût bcrypt modifié : ré-hachage transparent
+    upgrades = {}
+    if password_rehash:
+        upgrades["password_hash"] = await hash_secret(req.password)
+    if pin_rehash:
+        upgrades["pin_hash"] = await hash_secret(req.pin)
+    if upgrades:
+        await db.users.update_one({"_id": user["_id"]}, {"$set": upgrades})
+        logger.info(f"🔑 Empreinte(s) mise(s) à niveau pour {user['username']}: {', '.join(upgrades)}")
+
+    # Une session par appareil : les autres connexions de l'artisan restent valides
+    access_token = make_access_token(user["username"], user.get("is_admin", False))
+    refresh_token = await create_session(db, user["username"], device_label(request))
 
     return {
         "username": user["username"],
@@ -731,42 +819,38 @@ async def login(req: LoginRequest):
 
 @api_router.post("/auth/refresh")
 async def refresh(req: RefreshRequest):
-    user = await db.users.find_one({"refresh_token": req.refresh_token})
-    if not user:
+    # Rotation : l'ancien refresh token est consommé, un seul appel peut réussir
+    session = await consume_session(db, req.refresh_token)
+    if session is None:
         raise HTTPException(status_code=401, detail="Refresh token invalide.")
 
-    new_access_token = make_access_token(user["username"])
-    new_refresh_token = make_refresh_token(user["username"])
-    await db.users.update_one(
-        {"username": user["username"]},
-        {"$set": {"refresh_token": new_refresh_token}}
-    )
+    # Compte supprimé ou droits modifiés depuis la connexion : on relit l'utilisateur
+    user = await db.users.find_one({"username": session["username"]}, {"_id": 0, "username": 1, "is_admin": 1})
+    if not user:
+        raise HTTPException(status_code=401, detail="Refresh token invalide.")
 
     return {
         "username": user["username"],
-        "access_token": new_access_token,
-        "refresh_token": new_refresh_token,
+        "access_token": make_access_token(user["username"], user.get("is_admin", False)),
+        "refresh_token": await create_session(db, user["username"], previous=session),
     }
 
-@api_router.post("/auth/forgot-password")
+@api_router.post("/auth/logout")
+async def logout(req: RefreshRequest):
+    """Ferme la session de cet appareil (le jeton d'accès expire de lui-même)"""
+    await revoke_session(db, req.refresh_token)
+    return {"message": "Déconnecté"}
+
+@api_router.post("/auth/forgot-password", dependencies=[Depends(rate_limited(*FORGOT_LIMITS))])
 async def forgot_password(req: ForgotPasswordRequest):
     """Envoie un email avec un lien pour réinitialiser le mot de passe"""
-    user = await db.users.find_one({"email": req.email})
+    user = await db.users.find_one({"email_normalized": normalize_email(req.email)})
     if not user:
         # Informer l'utilisateur que l'email n'existe pas
         raise HTTPException(status_code=404, detail="Aucun compte n'est associé à cet email")
 
-    # Créer un token unique
-    token = secrets.token_urlsafe(32)
-    expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
-
-    # Sauvegarder dans MongoDB
-    await db.password_resets.insert_one({
-        "email": req.email,
-        "token": token,
-        "type": "password",
-        "expires_at": expires_at.isoformat()
-    })
+    # Créer un token unique (seule son empreinte est stockée, purgée par TTL)
+    token = await create_reset_token(db, req.email, "password")
 
     # Envoyer l'email avec le lien
     reset_link = f"https://artisanflow-appli.com/reset-password?token={token}"
@@ -826,56 +910,43 @@ L'équipe ArtisanFlow
 @api_router.post("/auth/reset-password")
 async def reset_password(req: ResetPasswordWithPinRequest):
     """Réinitialise le mot de passe avec validation du PIN"""
-    # Vérifier le token
-    reset_entry = await db.password_resets.find_one({"token": req.token, "type": "password"})
+    # Consommer le token : usage unique, même en cas d'échec de la validation ci-dessous
+    reset_entry = await consume_reset_token(db, req.token, "password")
     if not reset_entry:
         raise HTTPException(status_code=400, detail="Lien invalide ou expiré")
 
-    if datetime.fromisoformat(reset_entry["expires_at"]) < datetime.now(timezone.utc):
-        await db.password_resets.delete_one({"token": req.token})
-        raise HTTPException(status_code=400, detail="Ce lien a expiré")
-
     # Récupérer l'utilisateur
-    user = await db.users.find_one({"email": reset_entry["email"]})
+    user = await db.users.find_one({"email_normalized": normalize_email(reset_entry["email"])})
     if not user:
         raise HTTPException(status_code=400, detail="Utilisateur introuvable")
 
     # VALIDER LE PIN
-    if not verify_password(req.pin, user["pin_hash"]):
-        raise HTTPException(status_code=400, detail="Code PIN incorrect")
+    pin_match, _ = await verify_secret(req.pin, user.get("pin_hash", ""))
+    if not pin_match:
+        raise HTTPException(status_code=400, detail="Code PIN incorrect. Demandez un nouveau lien.")
 
     # Mettre à jour le mot de passe
     await db.users.update_one(
-        {"email": reset_entry["email"]},
-        {"$set": {"password_hash": hash_password(req.new_password)}}
+        {"username": user["username"]},
+        {"$set": {"password_hash": await hash_secret(req.new_password)}}
     )
-    
-    # Supprimer le token utilisé
-    await db.password_resets.delete_one({"token": req.token})
+    # Les appareils connectés avec l'ancien mot de passe doivent se reconnecter
+    await revoke_user_sessions(db, user["username"])
     
     logger.info(f"Mot de passe réinitialisé avec succès pour {reset_entry['email']}")
     return {"message": "Mot de passe réinitialisé avec succès"}
 
 
-@api_router.post("/auth/forgot-pin")
+@api_router.post("/auth/forgot-pin", dependencies=[Depends(rate_limited(*FORGOT_LIMITS))])
 async def forgot_pin(req: ForgotPinRequest):
     """Envoie un email avec un lien pour réinitialiser le code PIN"""
-    user = await db.users.find_one({"email": req.email})
+    user = await db.users.find_one({"email_normalized": normalize_email(req.email)})
     if not user:
         # Informer l'utilisateur que l'email n'existe pas
         raise HTTPException(status_code=404, detail="Aucun compte n'est associé à cet email")
 
-    # Créer un token unique
-    token = secrets.token_urlsafe(32)
-    expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
-
-    # Sauvegarder dans MongoDB
-    await db.password_resets.insert_one({
-        "email": req.email,
-        "token": token,
-        "type": "pin",
-        "expires_at": expires_at.isoformat()
-    })
+    # Créer un token unique (seule son empreinte est stockée, purgée par TTL)
+    token = await create_reset_token(db, req.email, "pin")
 
     # Envoyer l'email avec le lien
     reset_link = f"https://artisanflow-appli.com/reset-pin?token={token}"
@@ -935,39 +1006,34 @@ L'équipe ArtisanFlow
 @api_router.post("/auth/reset-pin")
 async def reset_pin(req: ResetPinWithPasswordRequest):
     """Réinitialise le code PIN avec validation du mot de passe"""
-    # Vérifier le token
-    reset_entry = await db.password_resets.find_one({"token": req.token, "type": "pin"})
+    # Consommer le token : usage unique, même en cas d'échec de la validation ci-dessous
+    reset_entry = await consume_reset_token(db, req.token, "pin")
     if not reset_entry:
         raise HTTPException(status_code=400, detail="Lien invalide ou expiré")
 
-    if datetime.fromisoformat(reset_entry["expires_at"]) < datetime.now(timezone.utc):
-        await db.password_resets.delete_one({"token": req.token})
-        raise HTTPException(status_code=400, detail="Ce lien a expiré")
-
     # Récupérer l'utilisateur
-    user = await db.users.find_one({"email": reset_entry["email"]})
+    user = await db.users.find_one({"email_normalized": normalize_email(reset_entry["email"])})
     if not user:
         raise HTTPException(status_code=400, detail="Utilisateur introuvable")
 
     # VALIDER LE MOT DE PASSE
-    if not verify_password(req.password, user["password_hash"]):
-        raise HTTPException(status_code=400, detail="Mot de passe incorrect")
+    password_match, _ = await verify_secret(req.password, user.get("password_hash", ""))
+    if not password_match:
+        raise HTTPException(status_code=400, detail="Mot de passe incorrect. Demandez un nouveau lien.")
 
     # Mettre à jour le PIN
     await db.users.update_one(
-        {"email": reset_entry["email"]},
-        {"$set": {"pin_hash": hash_password(req.new_pin)}}
+        {"username": user["username"]},
+        {"$set": {"pin_hash": await hash_secret(req.new_pin)}}
     )
-    
-    # Supprimer le token utilisé
-    await db.password_resets.delete_one({"token": req.token})
+    await revoke_user_sessions(db, user["username"])
     
     logger.info(f"Code PIN réinitialisé avec succès pour {reset_entry['email']}")
     return {"message": "Code PIN réinitialisé avec succès"}
 
 @api_router.post("/auth/forgot-username")
 async def forgot_username(req: ForgotPasswordRequest):
-    user = await db.users.find_one({"email": req.email})
+    user = await db.users.find_one({"email_normalized": normalize_email(req.email)})
     if user:
         print(f"[SIMULATION EMAIL] Identifiant pour {req.email}: {user['username']}")
     return {"message": "Si un compte existe, votre identifiant a été envoyé."}
@@ -984,14 +1050,14 @@ async def reset_account(data: dict):
         raise HTTPException(status_code=400, detail="Email requis")
     
     # Trouver l'utilisateur
-    user = await db.users.find_one({"email": email})
+    user = await db.users.find_one({"email_normalized": normalize_email(email)})
     
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
     
     # Supprimer TOUS les champs de configuration
     result = await db.users.update_one(
-        {"email": email},
+        {"username": user["username"]},
         {"$unset": {
             "config": "",
             "first_login": "",
@@ -1010,6 +1076,7 @@ async def reset_account(data: dict):
             "country_code": ""
         }}
     )
+    await bump_version(db, user["username"], "configuration")
     
     return {
         "success": True,
@@ -1018,11 +1085,17 @@ async def reset_account(data: dict):
         "reset": True
     }
 @api_router.get("/users/{username}/configuration")
-async def get_user_configuration(username: str):
+async def get_user_configuration(username: str, request: Request):
     """
     Récupère la configuration artisan et indique si le profil est déjà configuré.
+    Répond 304 si If-None-Match correspond à la version courante (ETag).
     """
     try:
+        etag = await resource_etag(db, request, username, "configuration")
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+
         user = await db.users.find_one(
             {"username": username},
             {
@@ -1049,10 +1122,10 @@ async def get_user_configuration(username: str):
         config["country"] = user.get("country", config.get("country"))
         config["depositPercentage"] = user.get("deposit_percentage", config.get("depositPercentage", 30))
 
-        return {
+        return with_etag(JSONResponse({
             "has_configured": has_configured,
             "configuration": config
-        }
+        }), etag)
 
     except Exception as e:
         logger.error(f"❌ Erreur récupération configuration: {str(e)}")
@@ -1100,6 +1173,7 @@ async def save_user_configuration(username: str, config: dict):
         if result.modified_count == 0:
             logger.warning(f"⚠️ Utilisateur {username} introuvable")
             return {"success": False, "message": "Utilisateur introuvable"}
+        await bump_version(db, username, "configuration")
 
         logger.info(f"✅ Configuration enregistrée pour {username}")
         return {"success": True, "message": "Configuration enregistrée"}
@@ -1188,7 +1262,7 @@ async def create_setup_intent(req: SetupIntentRequest):
 
 @api_router.post("/billing/portal")
 async def create_billing_portal_session(req: PortalSessionRequest):
-    user = await db.users.find_one({"email": req.email})
+    user = await db.users.find_one({"email_normalized": normalize_email(req.email)})
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur introuvable.")
 
@@ -1203,6 +1277,16 @@ async def create_billing_portal_session(req: PortalSessionRequest):
     except stripe._error.StripeError as e:
         raise HTTPException(status_code=400, detail=f"Erreur Stripe: {str(e)}")
 
+# Événements Stripe qui modifient le statut d'abonnement (poussé en SSE à l'artisan)
+SUBSCRIPTION_STATUS_EVENTS = {
+    "invoice.paid",
+    "invoice.payment_succeeded",
+    "invoice.payment_failed",
+    "customer.subscription.created",
+    "customer.subscription.updated",
+    "customer.subscription.deleted",
+}
+
 @app.post("/webhook/stripe")
 async def stripe_webhook(request: Request):
     payload = await request.body()
@@ -1241,7 +1325,7 @@ async def stripe_webhook(request: Request):
                 "status": "active",
                 "is_active": True,
                 "failures": 0,
-                "last_payment_date": datetime.now(timezone.utc).isoformat(),
+                "last_payment_date": datetime.now(timezone.utc),
                 "last_invoice_id": invoice_id
             }}
         )
@@ -1292,8 +1376,8 @@ async def stripe_webhook(request: Request):
             {"$set": {
                 "status": status,
                 "is_active": status in ["active", "trialing"],
-                "current_period_end": datetime.fromtimestamp(current_period_end, tz=timezone.utc).isoformat() if current_period_end else None,
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "current_period_end": datetime.fromtimestamp(current_period_end, tz=timezone.utc) if current_period_end else None,
+                "updated_at": datetime.now(timezone.utc)
             }},
             upsert=True
         )
@@ -1313,8 +1397,8 @@ async def stripe_webhook(request: Request):
                 "status": status,
                 "is_active": status in ["active", "trialing"],
                 "cancel_at_period_end": cancel_at_period_end,
-                "current_period_end": datetime.fromtimestamp(current_period_end, tz=timezone.utc).isoformat() if current_period_end else None,
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "current_period_end": datetime.fromtimestamp(current_period_end, tz=timezone.utc) if current_period_end else None,
+                "updated_at": datetime.now(timezone.utc)
             }}
         )
         
@@ -1329,7 +1413,7 @@ async def stripe_webhook(request: Request):
             {"$set": {
                 "status": "canceled",
                 "is_active": False,
-                "canceled_at": datetime.now(timezone.utc).isoformat()
+                "canceled_at": datetime.now(timezone.utc)
             }}
         )
         
@@ -1361,6 +1445,9 @@ async def stripe_webhook(request: Request):
         verification_status = data.get("verification", {}).get("status")
         
         logger.info(f"🆔 Tax ID mis à jour: {tax_id} pour customer {customer_id}")
+
+    if event_type in SUBSCRIPTION_STATUS_EVENTS:
+        await publish_subscription_change(db, data.get("subscription") if event_type.startswith("invoice.") else data.get("id"))
     return {"status": "success"}
 
 
@@ -1400,7 +1487,7 @@ async def get_subscription_status(username: str):
                         {"$set": {
                             "status": stripe_subscription.status,
                             "is_active": stripe_subscription.status in ["active", "trialing"],
-                            "updated_at": datetime.now(timezone.utc).isoformat()
+                            "updated_at": datetime.now(timezone.utc)
                         }}
                     )
                     subscription["status"] = stripe_subscription.status
@@ -1454,7 +1541,7 @@ async def cancel_subscription(username: str):
             {"stripe_subscription_id": stripe_sub_id},
             {"$set": {
                 "cancel_at_period_end": True,
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "updated_at": datetime.now(timezone.utc)
             }}
         )
         
@@ -1501,7 +1588,7 @@ async def reactivate_subscription(username: str):
             {"stripe_subscription_id": stripe_sub_id},
             {"$set": {
                 "cancel_at_period_end": False,
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "updated_at": datetime.now(timezone.utc)
             }}
         )
         
@@ -1562,12 +1649,40 @@ async def update_payment_method(username: str, payment_method_id: str):
         logger.error(f"Erreur lors de la mise à jour du moyen de paiement: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur lors de la mise à jour")
 
+# ============ CONDITIONAL LISTS (ETAG) ============
+
+async def etag_page(request: Request, username: str, resource: str, query: dict, projection: dict, limit: int, after: Optional[str]):
+    """
+    Page de liste avec ETag : 304 si If-None-Match correspond à la version
+    courante de la ressource, sans lire la collection. La version est toujours
+    lue sur le primaire (une lecture par _id) : un secondaire en retard
+    renverrait l'ancienne version et un 304 masquerait l'écriture qui vient
+    d'avoir lieu. La page (read_db) est lue dans la même session causale, pour
+    ne jamais être plus ancienne que la version annoncée par l'ETag.
+    """
+    async with await client.start_session() as session:
+        etag = await resource_etag(db, request, username, resource, session=session)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        page = await paginate(read_db[resource], query, projection, limit, after, session=session)
+    return with_etag(FastJSONResponse(page), etag)
+
+
 # ============ QUOTES ROUTES ============
 
+async def compute_totals(username: str, items: List[dict], vat_rate: Optional[float]) -> dict:
+    """Totaux HT / TVA / TTC exacts, au taux du pays de l'artisan par défaut"""
+    # country n'existe qu'après la configuration ; countryCode est posé à l'inscription
+    user = await db.users.find_one({"username": username}, {"_id": 0, "country": 1, "countryCode": 1}) or {}
+    try:
+        return price_document(items, country=user.get("country") or user.get("countryCode"), vat_rate=vat_rate)
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Ligne invalide: {e}")
+
 @api_router.post("/quotes")
 async def create_quote(quote: QuoteCreate, username: str):
-    total_ht = sum(item["quantity"] * item["unit_price"] for item in quote.items)
-    total_ttc = total_ht * 1.20  # TVA 20%
+    totals = await compute_totals(username, quote.items, quote.vat_rate)
     
     quote_obj = Quote(
         username=username,
@@ -1575,49 +1690,108 @@ async def create_quote(quote: QuoteCreate, username: str):
         client_email=quote.client_email,
         description=quote.description,
         items=quote.items,
-        total_ht=total_ht,
-        total_ttc=total_ttc,
+        vat_rate=quote.vat_rate,
+        **totals,
     )
     
     quote_dict = quote_obj.model_dump()
-    quote_dict['created_at'] = quote_dict['created_at'].isoformat()
     await db.quotes.insert_one(quote_dict)
+    await apply_stats_delta(db, username, {"total_quotes": 1, **quote_status_delta(None, quote_obj.status)})
+    await bump_version(db, username, "quotes")
     
     return quote_obj
 
 @api_router.get("/quotes")
-async def get_quotes(username: str):
-    quotes = await db.quotes.find({"username": username}, {"_id": 0}).to_list(1000)
-    for q in quotes:
-        if isinstance(q['created_at'], str):
-            q['created_at'] = datetime.fromisoformat(q['created_at'])
-    return quotes
+async def get_quotes(
+    request: Request,
+    username: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    projection = read_projection("quotes", fields, QUOTE_LIST_PROJECTION)
+    return await etag_page(request, username, "quotes", {"username": username}, projection, limit, after)
 
 @api_router.get("/quotes/{quote_id}")
-async def get_quote(quote_id: str, username: str):
-    quote = await db.quotes.find_one({"id": quote_id, "username": username}, {"_id": 0})
+async def get_quote(quote_id: str, username: str, fields: Optional[str] = None):
+    quote = await db.quotes.find_one({"id": quote_id, "username": username}, read_projection("quotes", fields, {"_id": 0}))
     if not quote:
         raise HTTPException(status_code=404, detail="Devis introuvable")
-    if isinstance(quote['created_at'], str):
-        quote['created_at'] = datetime.fromisoformat(quote['created_at'])
     return quote
 
 @api_router.put("/quotes/{quote_id}")
 async def update_quote_status(quote_id: str, username: str, status: str):
-    result = await db.quotes.update_one(
+    previous = await db.quotes.find_one_and_update(
         {"id": quote_id, "username": username},
-        {"$set": {"status": status}}
+        {"$set": {"status": status, "updated_at": datetime.now(timezone.utc)}},
+        projection={"_id": 0, "status": 1}
     )
-    if result.matched_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Devis introuvable")
+    await apply_stats_delta(db, username, quote_status_delta(previous.get("status"), status))
+    await bump_version(db, username, "quotes")
     return {"message": "Statut mis à jour"}
 
+@api_router.post("/quotes/{quote_id}/invoice")
+async def convert_quote_to_invoice(quote_id: str, username: str):
+    """
+    Transforme un devis en facture côté serveur, sans renvoyer les lignes.
+    1. Le devis est réservé atomiquement (statut accepted + invoice_id), ce qui
+       interdit une double facturation en cas de double clic ou de requêtes concurrentes.
+    2. La facture est créée à partir des lignes et totaux enregistrés du devis.
+    3. Si l'insertion échoue, la réservation est annulée (compensation).
+    """
+    invoice_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
+    quote = await db.quotes.find_one_and_update(
+        {"id": quote_id, "username": username, "invoice_id": {"$exists": False}},
+        {"$set": {"status": "accepted", "invoice_id": invoice_id, "updated_at": now}},
+        projection={"_id": 0},
+    )
+    if quote is None:
+        existing = await db.quotes.find_one({"id": quote_id, "username": username}, {"_id": 0, "invoice_id": 1})
+        if existing is None:
+            raise HTTPException(status_code=404, detail="Devis introuvable")
+        raise HTTPException(status_code=409, detail=f"Devis déjà facturé (facture {existing['invoice_id']})")
+
+    invoice_obj = Invoice(
+        id=invoice_id,
+        username=username,
+        quote_id=quote_id,
+        client_name=quote["client_name"],
+        client_email=quote.get("client_email"),
+        description=quote["description"],
+        items=quote["items"],
+        vat_rate=quote.get("vat_rate"),
+        total_ht=quote["total_ht"],
+        total_vat=quote.get("total_vat", round(quote["total_ttc"] - quote["total_ht"], 2)),
+        total_ttc=quote["total_ttc"],
+        vat_breakdown=quote.get("vat_breakdown", []),
+        created_at=now,
+    )
+    try:
+        await db.invoices.insert_one(invoice_obj.model_dump())
+    except Exception as e:
+        logger.error(f"❌ Création de la facture du devis {quote_id} échouée, annulation: {e}")
+        await db.quotes.update_one(
+            {"id": quote_id, "username": username, "invoice_id": invoice_id},
+            {"$set": {"status": quote.get("status"), "updated_at": datetime.now(timezone.utc)}, "$unset": {"invoice_id": ""}},
+        )
+        raise HTTPException(status_code=500, detail="Erreur lors de la création de la facture")
+
+    await apply_stats_delta(db, username, {
+        "total_invoices": 1,
+        **quote_status_delta(quote.get("status"), "accepted"),
+        **invoice_status_delta(None, invoice_obj.status, invoice_obj.total_ttc),
+    })
+    await bump_version(db, username, "quotes", "invoices")
+    return invoice_obj
+
 # ============ INVOICES ROUTES ============
 
 @api_router.post("/invoices")
 async def create_invoice(invoice: InvoiceCreate, username: str):
-    total_ht = sum(item["quantity"] * item["unit_price"] for item in invoice.items)
-    total_ttc = total_ht * 1.20
+    totals = await compute_totals(username, invoice.items, invoice.vat_rate)
     
     invoice_obj = Invoice(
         username=username,
@@ -1626,53 +1800,66 @@ async def create_invoice(invoice: InvoiceCreate, username: str):
         client_email=invoice.client_email,
         description=invoice.description,
         items=invoice.items,
-        total_ht=total_ht,
-        total_ttc=total_ttc,
+        vat_rate=invoice.vat_rate,
+        **totals,
     )
     
     invoice_dict = invoice_obj.model_dump()
-    invoice_dict['created_at'] = invoice_dict['created_at'].isoformat()
     await db.invoices.insert_one(invoice_dict)
+    await apply_stats_delta(db, username, {
+        "total_invoices": 1,
+        **invoice_status_delta(None, invoice_obj.status, invoice_obj.total_ttc),
+    })
+    await bump_version(db, username, "invoices")
     
     return invoice_obj
 
 @api_router.get("/invoices")
-async def get_invoices(username: str):
-    invoices = await db.invoices.find({"username": username}, {"_id": 0}).to_list(1000)
-    for inv in invoices:
-        if isinstance(inv['created_at'], str):
-            inv['created_at'] = datetime.fromisoformat(inv['created_at'])
-    return invoices
+async def get_invoices(
+    request: Request,
+    username: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    projection = read_projection("invoices", fields, INVOICE_LIST_PROJECTION)
+    return await etag_page(request, username, "invoices", {"username": username}, projection, limit, after)
 
 @api_router.get("/invoices/{invoice_id}")
-async def get_invoice(invoice_id: str, username: str):
-    invoice = await db.invoices.find_one({"id": invoice_id, "username": username}, {"_id": 0})
+async def get_invoice(invoice_id: str, username: str, fields: Optional[str] = None):
+    invoice = await db.invoices.find_one({"id": invoice_id, "username": username}, read_projection("invoices", fields, {"_id": 0}))
     if not invoice:
         raise HTTPException(status_code=404, detail="Facture introuvable")
-    if isinstance(invoice['created_at'], str):
-        invoice['created_at'] = datetime.fromisoformat(invoice['created_at'])
     return invoice
 
 @api_router.put("/invoices/{invoice_id}/status")
 async def update_invoice_status(invoice_id: str, username: str, status: str):
-    update_data = {"status": status}
+    now = datetime.now(timezone.utc)
+    update_data = {"status": status, "updated_at": now}
     if status == "paid":
-        update_data["paid_at"] = datetime.now(timezone.utc).isoformat()
+        update_data["paid_at"] = now
     
-    result = await db.invoices.update_one(
+    previous = await db.invoices.find_one_and_update(
         {"id": invoice_id, "username": username},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"_id": 0, "status": 1, "total_ttc": 1}
     )
-    if result.matched_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Facture introuvable")
+    await apply_stats_delta(
+        db, username, invoice_status_delta(previous.get("status"), status, previous.get("total_ttc", 0))
+    )
+    await bump_version(db, username, "invoices")
     return {"message": "Statut mis à jour"}
 
 
 # ============ CLIENTS ROUTES ============
 
-@api_router.post("/clients")
-async def create_client(client_data: dict, username: str):
-    """Create a new client"""
+CLIENT_PROJECTION = {"_id": 0, **SEARCH_FIELDS_PROJECTION}
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 50
+
+def build_client_document(client_data: dict, username: str) -> dict:
     client = {
         "id": str(uuid.uuid4()),
         "username": username,
@@ -1685,24 +1872,75 @@ async def create_client(client_data: dict, username: str):
         "notes": client_data.get("notes", ""),
         "created_at": datetime.now(timezone.utc)
     }
+    client["updated_at"] = client["created_at"]
+    client.update(search_fields(client))
+    return client
+
+def upload_rows(file: UploadFile, format: Optional[str]):
+    """Lignes d'un upload CSV / NDJSON, lues en flux"""
+    try:
+        fmt = detect_format(file.filename, file.content_type, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return iter_rows(file.file, fmt)
+
+@api_router.post("/clients")
+async def create_client(client_data: dict, username: str):
+    """Create a new client"""
+    client = build_client_document(client_data, username)
     await db.clients.insert_one(client)
+    await bump_version(db, username, "clients")
     return {"message": "Client créé", "client_id": client["id"]}
 
+@api_router.post("/clients/import")
+async def import_clients(username: str, file: UploadFile = File(...), format: Optional[str] = None):
+    """Import en masse de clients (CSV avec en-têtes ou NDJSON), erreurs rapportées par ligne"""
+    def build(row: dict) -> dict:
+        if not row.get("name"):
+            raise ValueError("name: champ requis")
+        return build_client_document(row, username)
+
+    report = await import_rows(upload_rows(file, format), build, db.clients)
+    if report["inserted"]:
+        await bump_version(db, username, "clients")
+    return report
+
 @api_router.get("/clients")
-async def get_clients(username: str):
-    """Get all clients for a user"""
-    clients = await db.clients.find(
-        {"username": username},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(1000)
-    return clients
+async def get_clients(
+    request: Request,
+    username: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """Get a page of clients for a user (most recent first)"""
+    projection = read_projection("clients", fields, CLIENT_PROJECTION)
+    return await etag_page(request, username, "clients", {"username": username}, projection, limit, after)
+
+@api_router.get("/clients/search")
+async def search_clients(
+    username: str,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """
+    Recherche par préfixe (nom, email, ville, code postal), insensible à la casse et aux accents.
+    Pagination par curseur sur (name_sort, id), servie par l'index de recherche.
+    """
+    query = search_filter(username, q)
+    if query is None:
+        return FastJSONResponse({"items": [], "next_cursor": None})
+    projection = read_projection("clients", fields, CLIENT_PROJECTION)
+    return FastJSONResponse(await paginate(read_db.clients, query, projection, limit, after, sort=SEARCH_SORT))
 
 @api_router.get("/clients/{client_id}")
-async def get_client(client_id: str, username: str):
+async def get_client(client_id: str, username: str, fields: Optional[str] = None):
     """Get a specific client"""
     client = await db.clients.find_one(
         {"id": client_id, "username": username},
-        {"_id": 0}
+        read_projection("clients", fields, CLIENT_PROJECTION)
     )
     if not client:
         raise HTTPException(status_code=404, detail="Client introuvable")
@@ -1711,20 +1949,24 @@ async def get_client(client_id: str, username: str):
 @api_router.put("/clients/{client_id}")
 async def update_client(client_id: str, client_data: dict, username: str):
     """Update a client"""
+    update = {
+        "name": client_data.get("name"),
+        "email": client_data.get("email"),
+        "phone": client_data.get("phone"),
+        "address": client_data.get("address"),
+        "city": client_data.get("city"),
+        "postal_code": client_data.get("postal_code"),
+        "notes": client_data.get("notes", "")
+    }
+    update.update(search_fields(update))
+    update["updated_at"] = datetime.now(timezone.utc)
     result = await db.clients.update_one(
         {"id": client_id, "username": username},
-        {"$set": {
-            "name": client_data.get("name"),
-            "email": client_data.get("email"),
-            "phone": client_data.get("phone"),
-            "address": client_data.get("address"),
-            "city": client_data.get("city"),
-            "postal_code": client_data.get("postal_code"),
-            "notes": client_data.get("notes", "")
-        }}
+        {"$set": update}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Client introuvable")
+    await bump_version(db, username, "clients")
     return {"message": "Client mis à jour"}
 
 @api_router.delete("/clients/{client_id}")
@@ -1733,11 +1975,15 @@ async def delete_client(client_id: str, username: str):
     result = await db.clients.delete_one({"id": client_id, "username": username})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Client introuvable")
+    await record_tombstone(db, username, "clients", client_id)
+    await bump_version(db, username, "clients")
     return {"message": "Client supprimé"}
 
 
 # ============ INVENTORY ROUTES ============
 
+INVENTORY_PROJECTION = {"_id": 0, **MOVEMENT_FIELDS_PROJECTION}
+
 @api_router.post("/inventory")
 async def create_inventory_item(item: InventoryItemCreate, username: str):
     item_obj = InventoryItem(
@@ -1751,56 +1997,256 @@ async def create_inventory_item(item: InventoryItemCreate, username: str):
     )
     
     item_dict = item_obj.model_dump()
-    item_dict['created_at'] = item_dict['created_at'].isoformat()
     await db.inventory.insert_one(item_dict)
+    await apply_stats_delta(db, username, inventory_delta(None, item_dict))
+    await bump_version(db, username, "inventory")
     
     return item_obj
 
+@api_router.post("/inventory/import")
+async def import_inventory(username: str, file: UploadFile = File(...), format: Optional[str] = None):
+    """Import en masse d'articles (CSV avec en-têtes ou NDJSON), validés contre InventoryItemCreate"""
+    def build(row: dict) -> dict:
+        item = InventoryItemCreate.model_validate(row)
+        return InventoryItem(username=username, **item.model_dump()).model_dump()
+
+    async def after_chunk(docs: List[dict]):
+        delta = {}
+        for doc in docs:
+            for field, value in inventory_delta(None, doc).items():
+                delta[field] = delta.get(field, 0) + value
+        await apply_stats_delta(db, username, delta)
+
+    report = await import_rows(upload_rows(file, format), build, db.inventory, after_chunk=after_chunk)
+    if report["inserted"]:
+        await bump_version(db, username, "inventory")
+    return report
+
 @api_router.get("/inventory")
-async def get_inventory(username: str):
-    items = await db.inventory.find({"username": username}, {"_id": 0}).to_list(1000)
-    for item in items:
-        if isinstance(item['created_at'], str):
-            item['created_at'] = datetime.fromisoformat(item['created_at'])
-    return items
+async def get_inventory(
+    request: Request,
+    username: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    projection = read_projection("inventory", fields, INVENTORY_PROJECTION)
+    return await etag_page(request, username, "inventory", {"username": username}, projection, limit, after)
+
+@api_router.get("/inventory/low-stock")
+async def get_low_stock_items(
+    request: Request,
+    username: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """Articles sous leur stock minimum (index partiel sur is_low_stock)"""
+    projection = read_projection("inventory", fields, INVENTORY_PROJECTION)
+    return await etag_page(request, username, "inventory", {"username": username, **LOW_STOCK_FILTER}, projection, limit, after)
 
 @api_router.get("/inventory/{item_id}")
-async def get_inventory_item(item_id: str, username: str):
-    item = await db.inventory.find_one({"id": item_id, "username": username}, {"_id": 0})
+async def get_inventory_item(item_id: str, username: str, fields: Optional[str] = None):
+    item = await db.inventory.find_one({"id": item_id, "username": username}, read_projection("inventory", fields, INVENTORY_PROJECTION))
     if not item:
         raise HTTPException(status_code=404, detail="Article introuvable")
-    if isinstance(item['created_at'], str):
-        item['created_at'] = datetime.fromisoformat(item['created_at'])
     return item
 
 @api_router.put("/inventory/{item_id}")
-async def update_inventory_item(item_id: str, username: str, quantity: int):
-    result = await db.inventory.update_one(
+async def update_inventory_item(item_id: str, username: str, quantity: int, background_tasks: BackgroundTasks):
+    previous = await db.inventory.find_one_and_update(
         {"id": item_id, "username": username},
-        {"$set": {"quantity": quantity}}
+        [{"$set": {"updated_at": datetime.now(timezone.utc)}}, *set_quantity_update(quantity)],
+        projection={"_id": 0, "name": 1, "reference": 1, "quantity": 1, "min_stock": 1}
     )
-    if result.matched_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Article introuvable")
+    item = {**previous, "quantity": quantity}
+    await apply_stats_delta(db, username, inventory_delta(previous, item))
+    await bump_version(db, username, "inventory")
+    if is_low_stock(item) and not is_low_stock(previous):
+        background_tasks.add_task(notify_low_stock, db, username, [item])
     return {"message": "Stock mis à jour"}
 
+@api_router.post("/inventory/movements")
+async def apply_stock_movements(batch: StockMovementBatch, username: str, background_tasks: BackgroundTasks):
+    """
+    Applique un lot de mouvements de stock (+/-) par incrément atomique dans un seul
+    bulk_write non ordonné : pas de mise à jour perdue entre chantiers, un seul
+    aller-retour pour le stock. Chaque update trace sur l'article les quantités
+    avant / après ce lot (last_movement), relues par un seul find : les passages
+    sous (ou au-dessus de) le stock minimum restent exacts même avec des lots ou
+    des PUT concurrents. Les mouvements sont enregistrés dans stock_movements.
+    """
+    net_deltas = {}
+    for movement in batch.movements:
+        net_deltas[movement.item_id] = net_deltas.get(movement.item_id, 0) + movement.delta
+
+    now = datetime.now(timezone.utc)
+    batch_id = str(uuid.uuid4())
+    operations = [
+        UpdateOne(
+            {"id": item_id, "username": username},
+            [{"$set": {"updated_at": now}}, *movement_update(batch_id, delta)],
+        )
+        for item_id, delta in net_deltas.items() if delta
+    ]
+    if operations:
+        await db.inventory.bulk_write(operations, ordered=False)
+
+    items = await db.inventory.find(
+        {"id": {"$in": list(net_deltas)}, "username": username},
+        {"_id": 0, "id": 1, "name": 1, "reference": 1, "quantity": 1, "min_stock": 1, MOVEMENT_FIELD: 1}
+    ).to_list(None)
+    found, before_by_id = {}, {}
+    for item in items:
+        stamp = item.pop(MOVEMENT_FIELD, None) or {}
+        if stamp.get("batch") == batch_id:
+            found[item["id"]] = {**item, "quantity": stamp["after"]}
+            before_by_id[item["id"]] = {**item, "quantity": stamp["before"]}
+        else:
+            # Delta net nul (aucune écriture) ou trace remplacée par un lot concurrent
+            found[item["id"]] = item
+            before_by_id[item["id"]] = {**item, "quantity": item["quantity"] - net_deltas[item["id"]]}
+
+    ledger = [{
+        "id": str(uuid.uuid4()),
+        "username": username,
+        "item_id": movement.item_id,
+        "delta": movement.delta,
+        "reason": movement.reason,
+        "created_at": now,
+    } for movement in batch.movements if movement.item_id in found and movement.delta]
+    if ledger:
+        await db.stock_movements.insert_many(ledger, ordered=False)
+
+    entered_low_stock, left_low_stock, stats_delta = [], [], {}
+    for item_id, item in found.items():
+        before = before_by_id[item_id]
+        for field, value in inventory_delta(before, item).items():
+            stats_delta[field] = stats_delta.get(field, 0) + value
+        if is_low_stock(item) and not is_low_stock(before):
+            entered_low_stock.append(item)
+        elif is_low_stock(before) and not is_low_stock(item):
+            left_low_stock.append(item)
+    await apply_stats_delta(db, username, stats_delta)
+    if found:
+        await bump_version(db, username, "inventory")
+    if entered_low_stock:
+        background_tasks.add_task(notify_low_stock, db, username, entered_low_stock)
+
+    return {
+        "applied": len(ledger),
+        "not_found": [item_id for item_id in net_deltas if item_id not in found],
+        "items": list(found.values()),
+        "entered_low_stock": entered_low_stock,
+        "left_low_stock": left_low_stock,
+    }
+
 @api_router.delete("/inventory/{item_id}")
 async def delete_inventory_item(item_id: str, username: str):
-    result = await db.inventory.delete_one({"id": item_id, "username": username})
-    if result.deleted_count == 0:
+    deleted = await db.inventory.find_one_and_delete(
+        {"id": item_id, "username": username},
+        projection={"_id": 0, "quantity": 1, "min_stock": 1}
+    )
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Article introuvable")
+    await record_tombstone(db, username, "inventory", item_id)
+    await apply_stats_delta(db, username, inventory_delta(deleted, None))
+    await bump_version(db, username, "inventory")
     return {"message": "Article supprimé"}
 
+# ============ EVENTS (SSE) ============
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@api_router.get("/events/stream")
+async def tenant_event_stream(request: Request, username: str):
+    """Flux SSE de l'artisan : compteurs du tableau de bord et statut d'abonnement"""
+    stats = await get_tenant_stats(db, username, read_db=read_db)
+    return StreamingResponse(
+        sse_stream(request, tenant_channel(username), [("dashboard", stats)]),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+@api_router.get("/admin/events/stream", dependencies=[Depends(require_admin)])
+async def admin_event_stream(request: Request):
+    """Flux SSE de la console Admin : nouveaux messages de contact"""
+    return StreamingResponse(sse_stream(request, ADMIN_CHANNEL), media_type="text/event-stream", headers=SSE_HEADERS)
+
+# ============ SYNC ROUTES ============
+
+@api_router.get("/sync")
+async def sync(
+    username: str,
+    since: Optional[str] = None,
+    limit: int = Query(DEFAULT_SYNC_LIMIT, ge=1, le=MAX_SYNC_LIMIT),
+):
+    """
+    Synchronisation différentielle (PWA hors ligne) : devis, factures, clients
+    et stock créés, modifiés ou supprimés depuis le jeton `since`.
+    Sans jeton : synchronisation complète. Rappeler avec next_token tant que has_more.
+    """
+    try:
+        return FastJSONResponse(await sync_changes(db, username, since, limit))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Jeton de synchronisation invalide")
+
 # ============ AI ROUTES ============
 
+def parse_period_bound(value: Optional[str], field: str) -> Optional[datetime]:
+    """Date ISO (YYYY-MM-DD ou datetime complet) -> datetime UTC"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Date invalide pour {field}: {value}")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def created_at_range(start_date: Optional[str], end_date: Optional[str]) -> dict:
+    """Filtre created_at [start_date, end_date] ; une date de fin sans heure inclut toute la journée"""
+    start = parse_period_bound(start_date, "start_date")
+    end = parse_period_bound(end_date, "end_date")
+    if end and end_date and "T" not in end_date:
+        end += timedelta(days=1)
+    elif end:
+        end += timedelta(microseconds=1)
+
+    bounds = {}
+    if start:
+        bounds["$gte"] = start
+    if end:
+        bounds["$lt"] = end
+    return {"created_at": bounds} if bounds else {}
+
 @api_router.post("/accounting/analyze")
 async def analyze_accounting(request: AccountingAnalysisRequest, username: str):
-    # Fetch invoices for the period
-    invoices = await db.invoices.find({"username": username}, {"_id": 0}).to_list(1000)
+    # Période poussée dans la requête (index username + created_at), agrégation mensuelle côté MongoDB
+    match = {"username": username, **created_at_range(request.start_date, request.end_date)}
+    # Tant que la migration convert-iso-dates n'est pas passée, created_at peut être
+    # une chaîne ISO : $convert la lit, une valeur illisible donne null au lieu de
+    # faire échouer toute l'agrégation ($dateToString n'accepte que des dates)
+    created_at = {"$convert": {"input": "$created_at", "to": "date", "onError": None, "onNull": None}}
+    periods = await db.invoices.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m", "date": created_at}},
+            "invoiced": {"$sum": "$total_ttc"},
+            "paid": {"$sum": {"$cond": [{"$eq": ["$status", "paid"]}, "$total_ttc", 0]}},
+            "pending": {"$sum": {"$cond": [{"$eq": ["$status", "unpaid"]}, "$total_ttc", 0]}},
+            "invoice_count": {"$sum": 1},
+        }},
+        {"$match": {"_id": {"$ne": None}}},
+        {"$sort": {"_id": 1}},
+        {"$project": {"_id": 0, "period": "$_id", "invoiced": 1, "paid": 1, "pending": 1, "invoice_count": 1}},
+    ]).to_list(None)
     
     # Calculate basic stats
-    total_revenue = sum(inv["total_ttc"] for inv in invoices if inv["status"] == "paid")
-    total_pending = sum(inv["total_ttc"] for inv in invoices if inv["status"] == "unpaid")
-    invoice_count = len(invoices)
+    total_revenue = sum(p["paid"] for p in periods)
+    total_pending = sum(p["pending"] for p in periods)
+    invoice_count = sum(p["invoice_count"] for p in periods)
     
     # Remplacement de l'ancien appel LLM par une réponse factice simple
     analysis_text = "Analyse désactivée suite à la migration. Le code sera réactivé avec une API LLM standard (OpenAI/Gemini)."
@@ -1811,7 +2257,8 @@ async def analyze_accounting(request: AccountingAnalysisRequest, username: str):
             "total_revenue": total_revenue,
             "total_pending": total_pending,
             "invoice_count": invoice_count
-        }
+        },
+        "periods": periods
     }
 
 
@@ -1851,7 +2298,7 @@ async def transcribe_voice(file: UploadFile = File(...)):
 
 # ============ CONTACT ROUTES ============
 
-@api_router.post("/contact/send")
+@api_router.post("/contact/send", dependencies=[Depends(rate_limited(*CONTACT_LIMITS))])
 async def send_contact_message(message: ContactMessageCreate):
     """
     Endpoint public pour recevoir les messages du formulaire de contact
@@ -1867,10 +2314,10 @@ async def send_contact_message(message: ContactMessageCreate):
         )
         
         message_dict = contact_message.model_dump()
-        message_dict["created_at"] = message_dict["created_at"].isoformat()
         
         await db.contact_messages.insert_one(message_dict)
         logger.info(f"Message de contact reçu de {message.name} ({message.email})")
+        publish_event(ADMIN_CHANNEL, "contact_message", contact_message.model_dump())
         
         # Envoyer une notification email à l'admin
         try:
@@ -1897,7 +2344,7 @@ async def send_contact_message(message: ContactMessageCreate):
         raise HTTPException(status_code=500, detail="Erreur lors de l'envoi du message")
 
 
-@api_router.get("/contact/messages")
+@api_router.get("/contact/messages", dependencies=[Depends(require_admin)])
 async def get_contact_messages(status: Optional[str] = None):
     """
     Récupère tous les messages de contact (pour la console Admin)
@@ -1909,23 +2356,19 @@ async def get_contact_messages(status: Optional[str] = None):
         
         messages = await db.contact_messages.find(query).sort("created_at", -1).to_list(500)
         
-        # Convertir les ObjectId si nécessaire
-        for msg in messages:
-            if "_id" in msg:
-                msg["_id"] = str(msg["_id"])
-        
-        return {
+        # ObjectId et dates sérialisés directement par FastJSONResponse
+        return FastJSONResponse({
             "success": True,
             "messages": messages,
             "total": len(messages)
-        }
+        })
         
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des messages: {str(e)}")
         raise HTTPException(status_code=500, detail="Erreur lors de la récupération des messages")
 
 
-@api_router.patch("/contact/messages/{message_id}/status")
+@api_router.patch("/contact/messages/{message_id}/status", dependencies=[Depends(require_admin)])
 async def update_message_status(message_id: str, status: str):
     """
     Met à jour le statut d'un message (new, read, archived)
@@ -1954,7 +2397,7 @@ async def update_message_status(message_id: str, status: str):
         raise HTTPException(status_code=500, detail="Erreur lors de la mise à jour")
 
 
-@api_router.delete("/contact/messages/{message_id}")
+@api_router.delete("/contact/messages/{message_id}", dependencies=[Depends(require_admin)])
 async def delete_contact_message(message_id: str):
     """
     Supprime un message de contact
@@ -2160,23 +2603,15 @@ async def handle_complaint_notification(request: Request):
 
 @api_router.get("/dashboard/stats")
 async def get_dashboard_stats(username: str):
-    quotes = await db.quotes.find({"username": username}).to_list(1000)
-    invoices = await db.invoices.find({"username": username}).to_list(1000)
-    inventory = await db.inventory.find({"username": username}).to_list(1000)
-    
-    total_revenue = sum(inv["total_ttc"] for inv in invoices if inv["status"] == "paid")
-    pending_invoices = sum(1 for inv in invoices if inv["status"] == "unpaid")
-    pending_quotes = sum(1 for q in quotes if q["status"] == "draft")
-    low_stock_items = sum(1 for item in inventory if item["quantity"] <= item["min_stock"])
-    
+    # Compteurs maintenus par $inc à chaque écriture : une seule lecture par _id
+    return FastJSONResponse(await get_tenant_stats(db, username, read_db=read_db))
+
+@api_router.get("/metrics/mongo-pool", dependencies=[Depends(require_admin)])
+async def get_mongo_pool_metrics():
+    """Attente et occupation du pool MongoDB de ce worker (pour dimensionner MONGO_MAX_POOL_SIZE)"""
     return {
-        "total_revenue": total_revenue,
-        "pending_invoices": pending_invoices,
-        "pending_quotes": pending_quotes,
-        "low_stock_items": low_stock_items,
-        "total_quotes": len(quotes),
-        "total_invoices": len(invoices),
-        "total_inventory_items": len(inventory),
+        "max_pool_size": mongo_client_options()["maxPoolSize"],
+        **pool_metrics.snapshot(),
     }
 
 @api_router.get("/")
@@ -0,0 +1,72 @@
+"""
+Sessions de rafraîchissement (refresh tokens), une par appareil
+Chaque connexion crée un document dans sessions, identifié par le SHA-256 du
+refresh token (_id : lookup unique O(1), le jeton en clair n'est jamais stocké) :
+    {"_id": "<sha256>", "username": "jdupont", "device": "Mozilla/5.0 ...",
+     "created_at": ..., "expires_at": ...}
+
+/auth/refresh consomme la session par find_one_and_delete puis en crée une
+nouvelle (rotation) : un refresh token ne sert qu'une fois, et deux refresh
+concurrents avec le même jeton ne peuvent pas réussir tous les deux.
+La nouvelle session reprend created_at et expires_at de l'ancienne : une
+chaîne de refresh expire SESSION_TTL après la connexion, il faut alors se
+reconnecter. L'index TTL sur expires_at purge les sessions expirées ; aucune
+écriture n'a lieu dans users.
+"""
+import hashlib
+import os
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import Request
+
+SESSION_TTL = timedelta(days=int(os.environ.get("REFRESH_TOKEN_TTL_DAYS", "30")))
+MAX_DEVICE_LENGTH = 200
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def device_label(request: Request) -> str:
+    return request.headers.get("user-agent", "")[:MAX_DEVICE_LENGTH]
+
+
+async def create_session(db, username: str, device: str = "", previous: Optional[dict] = None) -> str:
+    """
+    Ouvre une session et retourne son refresh token (en clair, à remettre au client).
+    `previous` : session consommée par une rotation, dont la durée de vie est conservée.
+    """
+    token = secrets.token_urlsafe(40)
+    now = datetime.now(timezone.utc)
+    await db.sessions.insert_one({
+        "_id": hash_token(token),
+        "username": username,
+        "device": previous.get("device", "") if previous else device,
+        "created_at": previous["created_at"] if previous else now,
+        "refreshed_at": now,
+        "expires_at": previous["expires_at"] if previous else now + SESSION_TTL,
+    })
+    return token
+
+
+async def consume_session(db, refresh_token: str) -> Optional[dict]:
+    """
+    Supprime et retourne la session du jeton, None si le jeton est inconnu,
+    déjà utilisé ou expiré (le TTL MongoDB ne purge qu'une fois par minute).
+    """
+    return await db.sessions.find_one_and_delete({
+        "_id": hash_token(refresh_token),
+        "expires_at": {"$gt": datetime.now(timezone.utc)},
+    })
+
+
+async def revoke_session(db, refresh_token: str) -> None:
+    await db.sessions.delete_one({"_id": hash_token(refresh_token)})
+
+
+async def revoke_user_sessions(db, username: str) -> int:
+    """Déconnecte tous les appareils de l'artisan (changement de mot de passe ou de PIN)"""
+    result = await db.sessions.delete_many({"username": username})
+    return result.deleted_count
@@ -0,0 +1,142 @@
+"""
+Synchronisation différentielle pour le mode hors ligne de la PWA
+Chaque document de quotes / invoices / clients / inventory porte updated_at
+(posé à la création et à chaque écriture) ; chaque suppression laisse une
+pierre tombale dans tombstones. /sync?since=<jeton> renvoie uniquement ce qui
+a changé depuis le jeton, collection par collection, via les index
+(username, updated_at, id).
+
+Le jeton est opaque : position (updated_at, id) atteinte dans chaque flux.
+Une fois un flux épuisé, sa position recule de SYNC_OVERLAP par rapport à
+l'heure de la requête : une écriture concurrente dont l'updated_at précède
+son commit n'est jamais manquée, au prix de quelques documents renvoyés en
+double (le client applique les changements par id, de façon idempotente).
+
+Les pierres tombales expirent après TOMBSTONE_RETENTION (index TTL) ; un jeton
+plus ancien provoque une resynchronisation complète (reset: true).
+"""
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from pymongo import ASCENDING
+
+from client_search import SEARCH_FIELDS_PROJECTION
+from low_stock import MOVEMENT_FIELDS_PROJECTION
+
+SYNC_COLLECTIONS = {
+    "quotes": {"_id": 0},
+    "invoices": {"_id": 0},
+    "clients": {"_id": 0, **SEARCH_FIELDS_PROJECTION},
+    "inventory": {"_id": 0, **MOVEMENT_FIELDS_PROJECTION},
+}
+TOMBSTONES = "deleted"
+
+DEFAULT_SYNC_LIMIT = 500
+MAX_SYNC_LIMIT = 2000
+SYNC_OVERLAP = timedelta(seconds=5)
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+# ============ JETON ============
+
+def encode_token(issued_at: datetime, positions: Dict[str, Tuple[datetime, str]]) -> str:
+    payload = {
+        "t": issued_at.isoformat(),
+        "p": {stream: [ts.isoformat(), doc_id] for stream, (ts, doc_id) in positions.items()},
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_token(token: str) -> Tuple[datetime, Dict[str, Tuple[datetime, str]]]:
+    """Retourne (date d'émission, positions par flux) ; lève ValueError si le jeton est invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        issued_at = datetime.fromisoformat(payload["t"])
+        positions = {
+            stream: (datetime.fromisoformat(ts), doc_id)
+            for stream, (ts, doc_id) in payload["p"].items()
+        }
+    except Exception as e:
+        raise ValueError(f"Jeton de synchronisation invalide: {token}") from e
+    return issued_at, positions
+
+
+# ============ ÉCRITURES ============
+
+async def record_tombstone(db, username: str, collection: str, doc_id: str) -> None:
+    """Enregistre la suppression d'un document pour les clients hors ligne"""
+    await db.tombstones.insert_one({
+        "username": username,
+        "collection": collection,
+        "id": doc_id,
+        "deleted_at": datetime.now(timezone.utc),
+    })
+
+
+# ============ LECTURE ============
+
+def _after(field: str, position: Tuple[datetime, str]) -> dict:
+    ts, doc_id = position
+    return {"$or": [{field: {"$gt": ts}}, {field: ts, "id": {"$gt": doc_id}}]}
+
+
+async def _read_stream(collection, username: str, field: str, projection: dict,
+                       position: Tuple[datetime, str], limit: int):
+    """Lit au plus `limit` changements après `position` ; retourne (documents, il en reste)"""
+    docs = await collection.find(
+        {"username": username, **_after(field, position)}, projection
+    ).sort([(field, ASCENDING), ("id", ASCENDING)]).limit(limit + 1).to_list(limit + 1)
+    return docs[:limit], len(docs) > limit
+
+
+async def sync_changes(db, username: str, since: Optional[str], limit: int = DEFAULT_SYNC_LIMIT) -> dict:
+    """
+    Changements depuis le jeton `since` (None = synchronisation complète) :
+    {
+        'reset': bool,                   # vider le cache local avant d'appliquer
+        'changes': {collection: [documents créés ou modifiés]},
+        'deleted': [{'collection', 'id'}],   # à appliquer après changes
+        'has_more': bool,                # rappeler immédiatement avec next_token
+        'next_token': str
+    }
+    """
+    now = datetime.now(timezone.utc)
+    reset = since is None
+    positions: Dict[str, Tuple[datetime, str]] = {}
+    if since:
+        issued_at, positions = decode_token(since)
+        if now - issued_at > TOMBSTONE_RETENTION:
+            # Des suppressions ont pu expirer depuis : on repart de zéro
+            reset, positions = True, {}
+
+    streams = [(name, "updated_at", projection) for name, projection in SYNC_COLLECTIONS.items()]
+    streams.append((TOMBSTONES, "deleted_at", {"_id": 0, "collection": 1, "id": 1, "deleted_at": 1}))
+
+    result = {"reset": reset, "changes": {}, "deleted": [], "has_more": False}
+    next_positions = {}
+    for name, field, projection in streams:
+        position = positions.get(name)
+        if position is None:
+            # En synchronisation complète, les suppressions passées sont sans objet
+            position = (now - SYNC_OVERLAP, "") if reset and name == TOMBSTONES else (_EPOCH, "")
+        collection = db.tombstones if name == TOMBSTONES else db[name]
+        docs, more = await _read_stream(collection, username, field, projection, position, limit)
+        if name == TOMBSTONES:
+            result["deleted"] = [{"collection": doc["collection"], "id": doc["id"]} for doc in docs]
+        else:
+            result["changes"][name] = docs
+        if more:
+            result["has_more"] = True
+            next_positions[name] = (docs[-1][field], docs[-1]["id"])
+        else:
+            # Flux épuisé : on repart de now - SYNC_OVERLAP (sans jamais reculer)
+            next_positions[name] = max(position, (now - SYNC_OVERLAP, ""))
+
+    result["next_token"] = encode_token(now, next_positions)
+    return result
@@ -0,0 +1,174 @@
+"""
+Compteurs du tableau de bord maintenus incrémentalement
+Un document tenant_stats par artisan (_id = username) est mis à jour par $inc
+à chaque écriture sur quotes / invoices / inventory, si bien que
+/dashboard/stats devient une simple lecture par _id.
+
+Chaque $inc incrémente aussi `seq`. Un $inc sur un artisan pas encore
+initialisé crée un document marqué partial (jamais servi tel quel) plutôt que
+d'être perdu. L'initialisation et la réconciliation recalculent les compteurs
+depuis le primaire puis les posent par compare-and-set sur `seq` : si un $inc
+est passé entre la lecture de seq et l'écriture, le calcul est refait, pour ne
+jamais écraser un incrément concurrent.
+
+Les compteurs ne sont pas exacts en permanence : le $inc suit l'écriture source
+sans transaction, et un recalcul qui voit déjà l'écriture source mais pas encore
+son $inc compte cette écriture deux fois (de même, un $inc perdu sur une erreur
+entre les deux écritures n'est jamais appliqué). Cette dérive est corrigée par
+la réconciliation périodique, active par défaut :
+    TENANT_STATS_RECONCILE_INTERVAL=3600   secondes entre deux passes (0 : désactivée)
+
+Réconciliation manuelle (recalcul depuis les collections sources) :
+    python tenant_stats.py reconcile [--username USER]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from dashboard_stats import EMPTY_STATS, compute_dashboard_stats
+from events import dashboard_payload, publish_event, tenant_channel, wants_dashboard_events
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logger = logging.getLogger(__name__)
+
+MAX_RECOMPUTE_ATTEMPTS = 5
+DEFAULT_RECONCILE_INTERVAL = 3600
+
+
+# ============ DELTAS ============
+
+def quote_status_delta(old_status: Optional[str], new_status: Optional[str]) -> Dict[str, int]:
+    """Variation de pending_quotes (devis en brouillon) lors d'un changement de statut"""
+    return {"pending_quotes": int(new_status == "draft") - int(old_status == "draft")}
+
+
+def invoice_status_delta(old_status: Optional[str], new_status: Optional[str], total_ttc: float) -> Dict[str, float]:
+    """Variation de pending_invoices et total_revenue lors d'un changement de statut"""
+    return {
+        "pending_invoices": int(new_status == "unpaid") - int(old_status == "unpaid"),
+        "total_revenue": total_ttc * (int(new_status == "paid") - int(old_status == "paid")),
+    }
+
+
+def is_low_stock(item: Optional[dict]) -> bool:
+    return bool(item) and item["quantity"] <= item["min_stock"]
+
+
+def inventory_delta(old_item: Optional[dict], new_item: Optional[dict]) -> Dict[str, int]:
+    """Variation des compteurs de stock ; old_item=None pour une création, new_item=None pour une suppression"""
+    return {
+        "total_inventory_items": int(new_item is not None) - int(old_item is not None),
+        "low_stock_items": int(is_low_stock(new_item)) - int(is_low_stock(old_item)),
+    }
+
+
+# ============ LECTURE / ÉCRITURE ============
+
+async def apply_stats_delta(db, username: str, delta: Dict[str, float]) -> None:
+    """
+    Applique un $inc atomique sur les compteurs de l'artisan (document partial
+    créé s'ils ne sont pas encore initialisés, voir get_tenant_stats).
+    Si un flux SSE local suit l'artisan, les nouveaux compteurs lui sont poussés.
+    """
+    increments = {field: value for field, value in delta.items() if value}
+    if not increments:
+        return
+    update = {"$inc": {**increments, "seq": 1}, "$setOnInsert": {"partial": True}}
+    if wants_dashboard_events(username):
+        stats = await db.tenant_stats.find_one_and_update(
+            {"_id": username}, update, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        if not stats.get("partial"):
+            publish_event(tenant_channel(username), "dashboard", dashboard_payload(stats))
+    else:
+        await db.tenant_stats.update_one({"_id": username}, update, upsert=True)
+
+
+async def store_recomputed_stats(db, username: str) -> Dict[str, float]:
+    """
+    Recalcule les compteurs depuis les sources (sur `db`, le primaire) et les
+    enregistre par compare-and-set sur seq ; retourne les compteurs calculés.
+    """
+    for _ in range(MAX_RECOMPUTE_ATTEMPTS):
+        current = await db.tenant_stats.find_one({"_id": username}, {"seq": 1})
+        stats = await compute_dashboard_stats(db, username)
+        if current is None:
+            try:
+                await db.tenant_stats.insert_one({"_id": username, **stats, "seq": 0})
+                return stats
+            except DuplicateKeyError:
+                # Un $inc (ou une autre initialisation) a créé le document : on recommence
+                continue
+        seq_filter = current["seq"] if "seq" in current else {"$exists": False}
+        result = await db.tenant_stats.update_one(
+            {"_id": username, "seq": seq_filter},
+            {"$set": {**stats, "seq": current.get("seq", 0)}, "$unset": {"partial": ""}},
+        )
+        if result.matched_count:
+            return stats
+    logger.warning(f"⚠️ tenant_stats {username}: écritures concurrentes, compteurs non enregistrés")
+    return stats
+
+
+async def get_tenant_stats(db, username: str, read_db=None) -> Dict[str, float]:
+    """
+    Compteurs de l'artisan ; calculés et enregistrés depuis les sources à la première lecture.
+    read_db (optionnel) : base avec une préférence de lecture secondaire pour la
+    lecture du document ; le calcul initial se fait toujours sur le primaire.
+    """
+    read_db = read_db if read_db is not None else db
+    stats = await read_db.tenant_stats.find_one({"_id": username})
+    if stats is None or stats.get("partial"):
+        stats = await store_recomputed_stats(db, username)
+    return {field: stats.get(field, default) for field, default in EMPTY_STATS.items()}
+
+
+async def reconcile_tenant_stats(db, username: Optional[str] = None) -> int:
+    """Recalcule les compteurs depuis les collections sources ; retourne le nombre d'artisans traités"""
+    usernames = [username] if username else await db.users.distinct("username")
+    for name in usernames:
+        await store_recomputed_stats(db, name)
+    logger.info(f"📊 Compteurs tenant_stats réconciliés pour {len(usernames)} artisan(s)")
+    return len(usernames)
+
+
+async def reconcile_periodically(db, interval_seconds: int) -> None:
+    """Boucle de réconciliation lancée au démarrage (TENANT_STATS_RECONCILE_INTERVAL, 0 : désactivée)"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await reconcile_tenant_stats(db)
+        except Exception as e:
+            logger.error(f"❌ Erreur de réconciliation tenant_stats: {e}")
+
+
+async def _main(username: Optional[str]) -> int:
+    from db_connection import create_mongo_client
+
+    client = create_mongo_client(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        count = await reconcile_tenant_stats(db, username)
+        print(f"reconcile: {count} artisan(s)")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Compteurs tenant_stats ArtisanFlow")
+    parser.add_argument("command", choices=["reconcile"])
+    parser.add_argument("--username", default=None)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.username)))
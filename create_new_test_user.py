@@ -5,9 +5,15 @@ Script pour créer un nouvel utilisateur test dans MongoDB
 
 import asyncio
 import os
+import sys
+from pathlib import Path
 from motor.motor_asyncio import AsyncIOMotorClient
 from passlib.context import CryptContext
 
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+from migrations import normalize_email  # noqa: E402
+
 # Configuration
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -27,11 +33,13 @@ async def create_test_user():
     pin = "5678"
     
     # Vérifier si l'utilisateur existe déjà
-    existing_user = await db.users.find_one({"email": email})
+    # Login, mot de passe oublié et réinitialisation cherchent par email_normalized
+    email_normalized = normalize_email(email)
+    existing_user = await db.users.find_one({"email_normalized": email_normalized})
     
     if existing_user:
         print(f"⚠️  L'utilisateur {email} existe déjà. Suppression...")
-        await db.users.delete_one({"email": email})
+        await db.users.delete_one({"_id": existing_user["_id"]})
         print("✅ Ancien utilisateur supprimé")
     
     # Hasher le mot de passe et le PIN
@@ -41,6 +49,7 @@ async def create_test_user():
     # Créer le nouvel utilisateur
     new_user = {
         "email": email,
+        "email_normalized": email_normalized,
         "username": "nouveau_artisan",
         "password_hash": password_hash,
         "pin_hash": pin_hash,
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Equivalence test for /dashboard/stats
+Seeds 10k+ quotes, invoices and inventory items for a throwaway tenant and
+checks that the MongoDB aggregation returns exactly what the former Python
+loop computed (revenue compared with a float tolerance: MongoDB sums doubles
+with extended precision, Python sums them naively).
+
+Requires MONGO_URL and DB_NAME (backend/.env is loaded if present).
+"""
+
+import asyncio
+import math
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+load_dotenv(Path(__file__).parent / "backend" / ".env")
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+from dashboard_stats import compute_dashboard_stats  # noqa: E402
+
+DOCS_PER_COLLECTION = 12000
+BATCH_SIZE = 2000
+
+
+def legacy_dashboard_stats(quotes, invoices, inventory):
+    """Former Python implementation of get_dashboard_stats (without the 1000-row cap)"""
+    total_revenue = sum(inv["total_ttc"] for inv in invoices if inv["status"] == "paid")
+    pending_invoices = sum(1 for inv in invoices if inv["status"] == "unpaid")
+    pending_quotes = sum(1 for q in quotes if q["status"] == "draft")
+    low_stock_items = sum(1 for item in inventory if item["quantity"] <= item["min_stock"])
+
+    return {
+        "total_revenue": total_revenue,
+        "pending_invoices": pending_invoices,
+        "pending_quotes": pending_quotes,
+        "low_stock_items": low_stock_items,
+        "total_quotes": len(quotes),
+        "total_invoices": len(invoices),
+        "total_inventory_items": len(inventory),
+    }
+
+
+def _seed_documents(username, rng):
+    now = datetime.now(timezone.utc).isoformat()
+    quotes = [{
+        "id": str(uuid.uuid4()),
+        "username": username,
+        "status": rng.choice(["draft", "sent", "accepted", "rejected"]),
+        "items": [{"name": "Article", "quantity": 1, "unit_price": 10.0}],
+        "total_ht": 10.0,
+        "total_ttc": 12.0,
+        "created_at": now,
+    } for _ in range(DOCS_PER_COLLECTION)]
+    invoices = [{
+        "id": str(uuid.uuid4()),
+        "username": username,
+        "status": rng.choice(["paid", "unpaid", "cancelled"]),
+        "total_ttc": round(rng.uniform(10, 5000), 2),
+        "created_at": now,
+    } for _ in range(DOCS_PER_COLLECTION)]
+    inventory = [{
+        "id": str(uuid.uuid4()),
+        "username": username,
+        "quantity": rng.randint(0, 50),
+        "min_stock": rng.randint(0, 20),
+        "created_at": now,
+    } for _ in range(DOCS_PER_COLLECTION)]
+    return quotes, invoices, inventory
+
+
+async def _insert(collection, docs):
+    for start in range(0, len(docs), BATCH_SIZE):
+        await collection.insert_many([dict(d) for d in docs[start:start + BATCH_SIZE]], ordered=False)
+
+
+async def run_equivalence_check():
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+    username = f"equivalence_test_{uuid.uuid4().hex[:8]}"
+    rng = random.Random(42)
+
+    try:
+        quotes, invoices, inventory = _seed_documents(username, rng)
+        # Noise from another tenant must not leak into the stats
+        other_quotes, other_invoices, other_inventory = _seed_documents(f"{username}_other", rng)
+        for collection, docs in (
+            (db.quotes, quotes + other_quotes[:500]),
+            (db.invoices, invoices + other_invoices[:500]),
+            (db.inventory, inventory + other_inventory[:500]),
+        ):
+            await _insert(collection, docs)
+
+        expected = legacy_dashboard_stats(quotes, invoices, inventory)
+        actual = await compute_dashboard_stats(db, username)
+
+        print(f"Expected: {expected}")
+        print(f"Actual:   {actual}")
+
+        ok = list(actual.keys()) == list(expected.keys())
+        for key, value in expected.items():
+            if key == "total_revenue":
+                same = math.isclose(actual[key], value, rel_tol=1e-9)
+            else:
+                same = actual[key] == value
+            print(f"{'✅' if same else '❌'} {key}: {actual[key]} (expected {value})")
+            ok = ok and same
+        return ok
+    finally:
+        for collection in (db.quotes, db.invoices, db.inventory):
+            await collection.delete_many({"username": {"$in": [username, f"{username}_other"]}})
+        client.close()
+
+
+def test_dashboard_stats_equivalence():
+    """Aggregation pipeline returns the same numbers as the legacy Python loop"""
+    print("\n=== Testing /dashboard/stats aggregation equivalence ===")
+    assert asyncio.run(run_equivalence_check())
+
+
+if __name__ == "__main__":
+    try:
+        test_dashboard_stats_equivalence()
+    except AssertionError:
+        print("\n❌ Dashboard stats differ from the legacy implementation")
+        sys.exit(1)
+    print("\n✅ Dashboard stats aggregation is equivalent to the legacy implementation")
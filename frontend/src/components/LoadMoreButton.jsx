@@ -0,0 +1,18 @@
+import React from 'react';
+import { Button } from '@/components/ui/button';
+
+export default function LoadMoreButton({ hasMore, loading, onClick }) {
+  if (!hasMore) return null;
+  return (
+    <div className="flex justify-center mt-8">
+      <Button
+        onClick={onClick}
+        disabled={loading}
+        className="bg-gray-800 hover:bg-gray-700 text-white px-6 py-2 rounded-full"
+        data-testid="load-more-button"
+      >
+        {loading ? 'Chargement...' : 'Charger plus'}
+      </Button>
+    </div>
+  );
+}
@@ -0,0 +1,55 @@
+import { useState, useEffect, useCallback, useRef } from 'react';
+import { toast } from 'sonner';
+import { fetchPage } from '@/utils/pagination';
+
+/**
+ * Liste paginée par curseur : charge la première page au montage, les suivantes
+ * à la demande (bouton "Charger plus") au lieu de tout l'historique d'un coup.
+ * reload() revient à la première page (après une création ou une modification).
+ * Quand url ou params changent (recherche), la liste est rechargée ; la réponse
+ * d'une requête dépassée par une plus récente est ignorée.
+ */
+export const useCursorPages = (url, params, errorMessage) => {
+  const [items, setItems] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const paramsKey = JSON.stringify(params);
+  const latestRequest = useRef(0);
+
+  const reload = useCallback(async () => {
+    const request = ++latestRequest.current;
+    try {
+      const page = await fetchPage(url, JSON.parse(paramsKey));
+      if (request !== latestRequest.current) return;
+      setItems(page.items);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      toast.error(errorMessage);
+    } finally {
+      setLoading(false);
+    }
+  }, [url, paramsKey, errorMessage]);
+
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    const request = latestRequest.current;
+    try {
+      const page = await fetchPage(url, JSON.parse(paramsKey), nextCursor);
+      if (request !== latestRequest.current) return;
+      setItems((current) => [...current, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      toast.error(errorMessage);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  useEffect(() => {
+    reload();
+  }, [reload]);
+
+  return { items, loading, hasMore: Boolean(nextCursor), loadingMore, loadMore, reload };
+};
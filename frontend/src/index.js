@@ -3,9 +3,12 @@ import ReactDOM from "react-dom/client";
 import "@/index.css";
 import "./i18n"; // Initialize i18n
 import App from "@/App";
+import { installAuthInterceptors } from "@/utils/auth";
 
 import GlobalErrorBoundary from "@/components/GlobalErrorBoundary";
 
+installAuthInterceptors();
+
 const root = ReactDOM.createRoot(document.getElementById("root"));
 root.render(
   <React.StrictMode>
@@ -51,6 +51,10 @@ export default function AdminPage() {
             </Link>
             <button
               onClick={() => {
+                const refreshToken = localStorage.getItem('af_refresh_token');
+                if (refreshToken) {
+                  axios.post(`${API}/auth/logout`, { refresh_token: refreshToken }).catch(() => {});
+                }
                 localStorage.removeItem('af_is_admin');
                 localStorage.removeItem('af_access_token');
                 localStorage.removeItem('af_refresh_token');
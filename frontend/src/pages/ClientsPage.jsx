@@ -7,15 +7,33 @@ import { Dialog, DialogContent, DialogHeader, DialogTitle } from '@/components/u
 import { Button } from '@/components/ui/button';
 import DashboardLayout from '@/components/DashboardLayout';
 import { API } from '@/config';
+import LoadMoreButton from '@/components/LoadMoreButton';
+import { useCursorPages } from '@/hooks/useCursorPages';
+
+const SEARCH_DEBOUNCE_MS = 300;
 
 export default function ClientsPage() {
   const navigate = useNavigate();
   const username = localStorage.getItem('af_username');
-  const [clients, setClients] = useState([]);
-  const [loading, setLoading] = useState(true);
   const [showModal, setShowModal] = useState(false);
   const [selectedClient, setSelectedClient] = useState(null);
   const [searchTerm, setSearchTerm] = useState('');
+  const [searchQuery, setSearchQuery] = useState('');
+
+  // Recherche côté serveur (/clients/search) : tous les clients sont trouvés,
+  // pas seulement ceux des pages déjà chargées
+  const {
+    items: clients, loading, hasMore, loadingMore, loadMore, reload: fetchClients,
+  } = useCursorPages(
+    searchQuery ? `${API}/clients/search` : `${API}/clients`,
+    searchQuery ? { username, q: searchQuery } : { username },
+    'Erreur lors du chargement des clients',
+  );
+
+  useEffect(() => {
+    const timer = setTimeout(() => setSearchQuery(searchTerm.trim()), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
   
   const [formData, setFormData] = useState({
     name: '',
@@ -27,21 +45,6 @@ export default function ClientsPage() {
     notes: ''
   });
 
-  useEffect(() => {
-    fetchClients();
-  }, []);
-
-  const fetchClients = async () => {
-    try {
-      const response = await axios.get(`${API}/clients`, { params: { username } });
-      setClients(response.data);
-    } catch (error) {
-      toast.error('Erreur lors du chargement des clients');
-    } finally {
-      setLoading(false);
-    }
-  };
-
   const handleSubmit = async (e) => {
     e.preventDefault();
     
@@ -91,12 +94,6 @@ export default function ClientsPage() {
     setShowModal(true);
   };
 
-  const filteredClients = clients.filter(client =>
-    client.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    (client.email && client.email.toLowerCase().includes(searchTerm.toLowerCase())) ||
-    (client.phone && client.phone.includes(searchTerm))
-  );
-
   return (
     <DashboardLayout>
       <div className="max-w-7xl mx-auto">
@@ -154,7 +151,7 @@ export default function ClientsPage() {
         {/* Clients Grid */}
         {loading ? (
           <div className="text-center py-12 text-gray-400">Chargement...</div>
-        ) : filteredClients.length === 0 ? (
+        ) : clients.length === 0 ? (
           <div className="text-center py-12">
             <Users className="mx-auto text-gray-600 mb-4" size={48} />
             <p className="text-gray-400">
@@ -163,7 +160,7 @@ export default function ClientsPage() {
           </div>
         ) : (
           <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-            {filteredClients.map((client) => (
+            {clients.map((client) => (
               <div
                 key={client.id}
                 className="bg-gray-900 border border-gray-800 rounded-lg p-6 hover:border-orange-600 transition group"
@@ -214,6 +211,8 @@ export default function ClientsPage() {
           </div>
         )}
 
+        {!loading && <LoadMoreButton hasMore={hasMore} loading={loadingMore} onClick={loadMore} />}
+
         {/* Add/Edit Client Modal */}
         <Dialog open={showModal} onOpenChange={setShowModal}>
           <DialogContent className="bg-gray-900 text-white border-gray-800 max-w-2xl">
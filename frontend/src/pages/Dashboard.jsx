@@ -109,6 +109,12 @@ export default function Dashboard() {
   const handleLogout = () => {
     const email = localStorage.getItem('af_email');
 
+    // Fermer la session de cet appareil côté serveur (les autres restent connectés)
+    const refreshToken = localStorage.getItem('af_refresh_token');
+    if (refreshToken) {
+      axios.post(`${API}/auth/logout`, { refresh_token: refreshToken }).catch(() => {});
+    }
+
     // Ne PAS tout effacer pour garder les préférences (tutoriaux vus, config locale)
     // On supprime uniquement les tokens et l'identité
     localStorage.removeItem('af_token');
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import { Link } from 'react-router-dom';
 import axios from 'axios';
 import { toast } from 'sonner';
@@ -8,11 +8,14 @@ import { Button } from '@/components/ui/button';
 
 import { BACKEND_URL } from '@/config';
 import { API } from '@/config';
+import LoadMoreButton from '@/components/LoadMoreButton';
+import { useCursorPages } from '@/hooks/useCursorPages';
 
 export default function InventoryPage() {
   const username = localStorage.getItem('af_username');
-  const [inventory, setInventory] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const {
+    items: inventory, loading, hasMore, loadingMore, loadMore, reload: fetchInventory,
+  } = useCursorPages(`${API}/inventory`, { username }, 'Erreur lors du chargement du stock');
   const [showModal, setShowModal] = useState(false);
   const [formData, setFormData] = useState({
     name: '',
@@ -23,21 +26,6 @@ export default function InventoryPage() {
     category: 'Matériaux',
   });
 
-  useEffect(() => {
-    fetchInventory();
-  }, []);
-
-  const fetchInventory = async () => {
-    try {
-      const response = await axios.get(`${API}/inventory`, { params: { username } });
-      setInventory(response.data);
-    } catch (error) {
-      toast.error('Erreur lors du chargement du stock');
-    } finally {
-      setLoading(false);
-    }
-  };
-
   const handleChange = (e) => {
     setFormData({ ...formData, [e.target.name]: e.target.value });
   };
@@ -175,6 +163,8 @@ export default function InventoryPage() {
           ))}
         </div>
 
+        <LoadMoreButton hasMore={hasMore} loading={loadingMore} onClick={loadMore} />
+
         {inventory.length === 0 && (
           <div className="text-center py-20">
             <p className="text-gray-400 text-lg mb-4">Aucun article en stock</p>
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import { toast } from 'sonner';
@@ -9,12 +9,15 @@ import DashboardLayout from '@/components/DashboardLayout';
 
 import { BACKEND_URL } from '@/config';
 import { API } from '@/config';
+import LoadMoreButton from '@/components/LoadMoreButton';
+import { useCursorPages } from '@/hooks/useCursorPages';
 
 export default function InvoicesPage() {
   const navigate = useNavigate();
   const username = localStorage.getItem('af_username');
-  const [invoices, setInvoices] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const {
+    items: invoices, loading, hasMore, loadingMore, loadMore, reload: fetchInvoices,
+  } = useCursorPages(`${API}/invoices`, { username }, 'Erreur lors du chargement des factures');
   const [showModal, setShowModal] = useState(false);
   const [formData, setFormData] = useState({
     client_name: '',
@@ -23,21 +26,6 @@ export default function InvoicesPage() {
     items: [{ name: '', quantity: 1, unit_price: 0 }],
   });
 
-  useEffect(() => {
-    fetchInvoices();
-  }, []);
-
-  const fetchInvoices = async () => {
-    try {
-      const response = await axios.get(`${API}/invoices`, { params: { username } });
-      setInvoices(response.data);
-    } catch (error) {
-      toast.error('Erreur lors du chargement des factures');
-    } finally {
-      setLoading(false);
-    }
-  };
-
   const handleChange = (e) => {
     setFormData({ ...formData, [e.target.name]: e.target.value });
   };
@@ -141,7 +129,7 @@ export default function InvoicesPage() {
               <p className="text-sm text-gray-400 mb-4">{invoice.client_email}</p>
               <p className="text-sm text-gray-300 mb-4 line-clamp-2">{invoice.description}</p>
               <div className="flex items-center justify-between pt-4 border-t border-gray-700">
-                <div className="text-xs text-gray-400">{invoice.items?.length || 0} article(s)</div>
+                <div className="text-xs text-gray-400">{invoice.items_count ?? invoice.items?.length ?? 0} article(s)</div>
                 <div className="text-xl font-bold text-orange-500">{invoice.total_ttc.toFixed(2)} €</div>
               </div>
               {invoice.status === 'unpaid' && (
@@ -158,6 +146,8 @@ export default function InvoicesPage() {
           ))}
         </div>
 
+        <LoadMoreButton hasMore={hasMore} loading={loadingMore} onClick={loadMore} />
+
         {invoices.length === 0 && (
           <div className="text-center py-20">
             <p className="text-gray-400 text-lg mb-4">Aucune facture pour le moment</p>
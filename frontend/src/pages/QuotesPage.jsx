@@ -2,13 +2,15 @@ import React, { useState, useEffect, useRef } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import { toast } from 'sonner';
-import { Plus, Mic, MicOff, Trash2, ChevronDown, Edit, Volume2, Sparkles } from 'lucide-react';
+import { Plus, Mic, MicOff, Trash2, ChevronDown, Edit, Volume2, Sparkles, FileText } from 'lucide-react';
 import { Dialog, DialogContent, DialogHeader, DialogTitle } from '@/components/ui/dialog';
 import { Button } from '@/components/ui/button';
 import DashboardLayout from '@/components/DashboardLayout';
 
 import { BACKEND_URL } from '@/config';
 import { API } from '@/config';
+import LoadMoreButton from '@/components/LoadMoreButton';
+import { useCursorPages } from '@/hooks/useCursorPages';
 
 import TutorialModal from '@/components/TutorialModal';
 import { TUTORIALS } from '@/constants/tutorials';
@@ -16,9 +18,11 @@ import { TUTORIALS } from '@/constants/tutorials';
 export default function QuotesPage() {
   const navigate = useNavigate();
   const username = localStorage.getItem('af_username');
-  const [quotes, setQuotes] = useState([]);
-  const [loading, setLoading] = useState(true);
+  const {
+    items: quotes, loading, hasMore, loadingMore, loadMore, reload: fetchQuotes,
+  } = useCursorPages(`${API}/quotes`, { username }, 'Erreur lors du chargement des devis');
   const [showModal, setShowModal] = useState(false);
+  const [convertingId, setConvertingId] = useState(null);
   const [isRecording, setIsRecording] = useState(false);
   const mediaRecorderRef = useRef(null);
   const audioChunksRef = useRef([]);
@@ -33,8 +37,6 @@ export default function QuotesPage() {
   });
 
   useEffect(() => {
-    fetchQuotes();
-
     // Check tutorial status
     const tutorialSeen = localStorage.getItem('af_tutorial_devis_seen');
     if (!tutorialSeen || tutorialSeen === 'false') {
@@ -47,17 +49,6 @@ export default function QuotesPage() {
     localStorage.setItem('af_tutorial_devis_seen', 'true');
   };
 
-  const fetchQuotes = async () => {
-    try {
-      const response = await axios.get(`${API}/quotes`, { params: { username } });
-      setQuotes(response.data);
-    } catch (error) {
-      toast.error('Erreur lors du chargement des devis');
-    } finally {
-      setLoading(false);
-    }
-  };
-
   const startRecording = async () => {
     try {
       const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
@@ -130,6 +121,21 @@ export default function QuotesPage() {
     setFormData({ ...formData, items: newItems });
   };
 
+  // Conversion côté serveur : une seule requête, sans renvoyer les lignes du devis
+  const convertToInvoice = async (quoteId) => {
+    if (convertingId) return;
+    setConvertingId(quoteId);
+    try {
+      await axios.post(`${API}/quotes/${quoteId}/invoice`, null, { params: { username } });
+      toast.success('Facture créée à partir du devis');
+      fetchQuotes();
+    } catch (error) {
+      toast.error(error.response?.data?.detail || 'Erreur lors de la création de la facture');
+    } finally {
+      setConvertingId(null);
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     try {
@@ -312,12 +318,25 @@ export default function QuotesPage() {
               <p className="text-sm text-gray-400 mb-4">{quote.client_email}</p>
               <p className="text-sm text-gray-300 mb-4 line-clamp-2">{quote.description}</p>
               <div className="flex items-center justify-between pt-4 border-t border-gray-700">
-                <div className="text-xs text-gray-400">{quote.items?.length || 0} article(s)</div>
+                <div className="text-xs text-gray-400">{quote.items_count ?? quote.items?.length ?? 0} article(s)</div>
                 <div className="text-xl font-bold text-orange-500">{quote.total_ttc.toFixed(2)} €</div>
               </div>
+              {!quote.invoice_id && ['draft', 'sent', 'accepted'].includes(quote.status) && (
+                <button
+                  onClick={() => convertToInvoice(quote.id)}
+                  disabled={convertingId === quote.id}
+                  className="mt-4 w-full bg-green-600 hover:bg-green-700 disabled:opacity-50 text-white py-2 rounded-lg flex items-center justify-center gap-2"
+                  data-testid={`convert-quote-${quote.id}`}
+                >
+                  <FileText size={18} />
+                  {convertingId === quote.id ? 'Création...' : 'Convertir en facture'}
+                </button>
+              )}
             </div>
           ))}
         </div>
+
+        <LoadMoreButton hasMore={hasMore} loading={loadingMore} onClick={loadMore} />
       </div>
 
       <Dialog open={showModal} onOpenChange={setShowModal}>
@@ -0,0 +1,73 @@
+// auth.js - Jeton d'accès sur toutes les requêtes axios, renouvelé via /auth/refresh
+// Le backend émet des jetons signés à durée limitée ; sur un 401 on tente un
+// seul refresh (partagé entre les requêtes concurrentes) puis on rejoue la requête.
+// Si le refresh échoue (session expirée, révoquée, ou ancien jeton d'avant les
+// sessions par appareil), on efface les jetons et on renvoie vers la connexion.
+
+import axios from 'axios';
+import { API } from '@/config';
+
+let refreshing = null;
+
+function refreshAccessToken() {
+  if (!refreshing) {
+    const refresh_token = localStorage.getItem('af_refresh_token');
+    refreshing = axios
+      .post(`${API}/auth/refresh`, { refresh_token }, { skipAuthRefresh: true })
+      .then((response) => {
+        localStorage.setItem('af_access_token', response.data.access_token);
+        localStorage.setItem('af_refresh_token', response.data.refresh_token);
+        return response.data.access_token;
+      })
+      .finally(() => {
+        refreshing = null;
+      });
+  }
+  return refreshing;
+}
+
+function redirectToLogin() {
+  const isAdmin = localStorage.getItem('af_is_admin') === 'true';
+  localStorage.removeItem('af_access_token');
+  localStorage.removeItem('af_refresh_token');
+  if (!window.location.pathname.includes('/login')) {
+    window.location.assign(isAdmin ? '/admin/login' : '/login');
+  }
+}
+
+export function installAuthInterceptors() {
+  axios.interceptors.request.use((config) => {
+    const token = localStorage.getItem('af_access_token');
+    if (token && !config.headers.Authorization) {
+      config.headers.Authorization = `Bearer ${token}`;
+    }
+    return config;
+  });
+
+  axios.interceptors.response.use(undefined, async (error) => {
+    const { config, response } = error;
+    if (
+      response?.status !== 401 ||
+      !config ||
+      config.skipAuthRefresh ||
+      config._retried ||
+      config.url?.includes('/auth/')
+    ) {
+      throw error;
+    }
+    if (!localStorage.getItem('af_refresh_token')) {
+      redirectToLogin();
+      throw error;
+    }
+    let token;
+    try {
+      token = await refreshAccessToken();
+    } catch (refreshError) {
+      redirectToLogin();
+      throw error;
+    }
+    config._retried = true;
+    config.headers.Authorization = `Bearer ${token}`;
+    return axios(config);
+  });
+}
@@ -0,0 +1,13 @@
+// pagination.js - Lecture des listes paginées par curseur (/quotes, /invoices, /clients, /inventory)
+// Le backend renvoie { items, next_cursor } ; la page suivante se demande avec after=next_cursor.
+
+import axios from 'axios';
+
+export const PAGE_SIZE = 50;
+
+export async function fetchPage(url, params = {}, after = null) {
+  const response = await axios.get(url, {
+    params: { ...params, limit: PAGE_SIZE, ...(after ? { after } : {}) },
+  });
+  return { items: response.data.items, nextCursor: response.data.next_cursor };
+}
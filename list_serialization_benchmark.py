@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for the large list endpoints
+Compares, per 1000 quote-like rows, the default FastAPI path
+(jsonable_encoder + JSONResponse.render) with FastJSONResponse (orjson),
+and the payload size of full rows against the default slim list projection.
+No database needed: rows are generated in memory with the same shape as
+documents read from MongoDB (aware datetimes, nested items).
+"""
+
+import sys
+import timeit
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fast_json import FastJSONResponse, orjson  # noqa: E402
+from projections import QUOTE_LIST_PROJECTION  # noqa: E402
+
+ROWS = 1000
+REPEAT = 20
+
+
+def make_rows(count):
+    now = datetime.now(timezone.utc)
+    return [{
+        "id": str(uuid.uuid4()),
+        "username": "artisan_bench",
+        "client_name": f"Client {i}",
+        "client_email": f"client{i}@example.com",
+        "description": "Rénovation salle de bain - dépose, plomberie, carrelage",
+        "items": [
+            {"name": f"Article {j}", "quantity": j + 1, "unit_price": 12.5 * (j + 1)}
+            for j in range(5)
+        ],
+        "status": "draft",
+        "total_ht": 1234.5,
+        "total_ttc": 1481.4,
+        "created_at": now,
+    } for i in range(count)]
+
+
+def default_path(page):
+    return JSONResponse(jsonable_encoder(page)).body
+
+
+def fast_path(page):
+    return FastJSONResponse(page).body
+
+
+def slim(row):
+    """What QUOTE_LIST_PROJECTION returns for a row (items_count computed by MongoDB)"""
+    projected = {field: row[field] for field in QUOTE_LIST_PROJECTION if field in row}
+    projected["items_count"] = len(row["items"])
+    return projected
+
+
+def main():
+    page = {"items": make_rows(ROWS), "next_cursor": None}
+    assert default_path(page) == fast_path(page), "Both paths must produce the same bytes"
+
+    print(f"\n=== List serialization benchmark ({ROWS} rows, best of {REPEAT}) ===")
+    print(f"orjson available: {orjson is not None}")
+    results = {}
+    for name, func in (("jsonable_encoder + JSONResponse", default_path), ("FastJSONResponse", fast_path)):
+        best = min(timeit.repeat(lambda: func(page), number=1, repeat=REPEAT))
+        results[name] = best
+        print(f"{name:<34} {best * 1000:8.2f} ms / {ROWS} rows")
+
+    speedup = results["jsonable_encoder + JSONResponse"] / results["FastJSONResponse"]
+    print(f"Speedup: x{speedup:.1f}")
+
+    full_bytes = len(fast_path(page))
+    slim_bytes = len(fast_path({"items": [slim(row) for row in page["items"]], "next_cursor": None}))
+    print(f"\nPayload: full rows {full_bytes / 1024:.1f} KiB, slim projection {slim_bytes / 1024:.1f} KiB "
+          f"(x{full_bytes / slim_bytes:.1f} smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Pricing engine benchmark
+- One 10,000-line quote: exact integer pricing (price_document) against the
+  legacy float sum(quantity * unit_price) * 1.20, with the cent drift of the
+  float path.
+- Batch repricing after a rate change: reprice_batch (vectorized with numpy)
+  against price_document called quote by quote.
+No database needed: quotes are generated in memory.
+"""
+
+import random
+import sys
+import timeit
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+from pricing import np, price_document, reprice_batch  # noqa: E402
+
+LINES = 10_000
+BATCH_QUOTES = 5_000
+BATCH_LINES = 20
+REPEAT = 5
+RATES = [5.5, 10, 20]
+
+
+def make_items(count, rng):
+    return [{
+        "name": f"Article {i}",
+        "quantity": rng.choice([1, 2, 0.5, 1.25, 3, 7.5]),
+        "unit_price": round(rng.uniform(0.1, 250), 2),
+        "vat_rate": rng.choice(RATES),
+    } for i in range(count)]
+
+
+def legacy_total_ttc(items):
+    return sum(item["quantity"] * item["unit_price"] for item in items) * 1.20
+
+
+def best_ms(func):
+    return min(timeit.repeat(func, number=1, repeat=REPEAT)) * 1000
+
+
+def main():
+    rng = random.Random(42)
+
+    items = make_items(LINES, rng)
+    single_rate = [{**item, "vat_rate": 20} for item in items]
+    exact = price_document(single_rate, country="FR")
+    exact_ttc = Decimal(str(exact["total_ttc"]))
+    legacy_ttc = Decimal(repr(legacy_total_ttc(items)))
+    print(f"\n=== Single quote, {LINES} lines (best of {REPEAT}) ===")
+    print(f"legacy float sum * 1.20   {best_ms(lambda: legacy_total_ttc(items)):8.2f} ms")
+    print(f"price_document (exact)    {best_ms(lambda: price_document(items, country='FR')):8.2f} ms")
+    print(f"total TTC at 20 %: legacy float {legacy_ttc} (no cent rounding), exact {exact_ttc} (per-line cents)")
+
+    quotes = [{"items": make_items(BATCH_LINES, rng)} for _ in range(BATCH_QUOTES)]
+    countries = ["FR"] * len(quotes)
+    remap = {Decimal("10"): Decimal("12")}
+    print(f"\n=== Batch repricing, {BATCH_QUOTES} quotes x {BATCH_LINES} lines (best of {REPEAT}) ===")
+    print(f"numpy available: {np is not None}")
+    per_quote = best_ms(lambda: [price_document(q["items"], country="FR") for q in quotes])
+    batch = best_ms(lambda: reprice_batch(quotes, countries))
+    print(f"price_document per quote  {per_quote:8.2f} ms")
+    print(f"reprice_batch             {batch:8.2f} ms  (x{per_quote / batch:.1f})")
+    print(f"reprice_batch with remap  {best_ms(lambda: reprice_batch(quotes, countries, remap)):8.2f} ms")
+    assert reprice_batch(quotes, countries) == [price_document(q["items"], country="FR") for q in quotes]
+
+
+if __name__ == "__main__":
+    main()
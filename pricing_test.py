@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Pricing engine tests
+Pins the money rules of backend/pricing.py:
+- half-up rounding of line HT and of VAT, per rate and per line
+- per-line discounts and global discount lines (amount and percent), with
+  pro-rata allocation between VAT rates and the remainder on the largest base
+- country default rates and document / line rate overrides
+- reprice_batch (vectorized) == price_document, including rate remapping
+No database needed.
+"""
+
+import random
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+from pricing import (  # noqa: E402
+    VAT_ROUNDING_PER_LINE, price_document, remap_rates, reprice_batch,
+)
+
+
+def test_half_up_rounding():
+    """Line HT and VAT are rounded half up to the cent, never with float drift"""
+    print("\n=== Testing half-up rounding ===")
+    # 3 x 0.105 = 0.315 -> 0.32 HT ; 0.32 x 20% = 0.064 -> 0.06
+    totals = price_document([{"quantity": 3, "unit_price": 0.105, "vat_rate": 20}])
+    assert totals["total_ht"] == 0.32, totals
+    assert totals["total_vat"] == 0.06, totals
+    assert totals["total_ttc"] == 0.38, totals
+    # 0.1 + 0.2 classic float trap : exact 0.30
+    totals = price_document([{"quantity": 1, "unit_price": 0.1}, {"quantity": 1, "unit_price": 0.2}], country="FR")
+    assert totals["total_ht"] == 0.3 and totals["total_ttc"] == 0.36, totals
+    # String amounts with a French decimal comma
+    totals = price_document([{"quantity": "2,5", "unit_price": "12,345", "vat_rate": "5,5"}])
+    assert totals["total_ht"] == 30.86, totals  # 30.8625 -> 30.86
+    assert totals["total_vat"] == 1.70, totals  # 1.6973 -> 1.70
+    print("✅ half-up rounding")
+
+
+def test_vat_rounding_modes():
+    """Per-rate rounding (default) rounds the summed base, per-line rounds each line"""
+    print("\n=== Testing VAT rounding modes ===")
+    items = [{"quantity": 1, "unit_price": 0.05, "vat_rate": 10}] * 3
+    # Per rate : 0.15 x 10% = 0.015 -> 0.02 ; per line : 3 x round(0.005) = 3 x 0.01
+    assert price_document(items)["total_vat"] == 0.02
+    assert price_document(items, vat_rounding=VAT_ROUNDING_PER_LINE)["total_vat"] == 0.03
+    print("✅ VAT rounding modes")
+
+
+def test_default_rates():
+    """Line rate > document rate > country rate > FR fallback"""
+    print("\n=== Testing default VAT rates ===")
+    line = [{"quantity": 1, "unit_price": 100}]
+    assert price_document(line, country="BE")["total_vat"] == 21.0
+    assert price_document(line, country="CH")["total_vat"] == 8.1
+    assert price_document(line, country="XX")["total_vat"] == 20.0
+    assert price_document(line, country=None)["total_vat"] == 20.0
+    assert price_document(line, country="BE", vat_rate=6)["total_vat"] == 6.0
+    assert price_document([{**line[0], "vat_rate": 0}], country="BE", vat_rate=6)["total_vat"] == 0.0
+    print("✅ default VAT rates")
+
+
+def test_line_discount():
+    """discount_percent applies to the rounded line HT, then rounds half up"""
+    print("\n=== Testing line discounts ===")
+    totals = price_document([{"quantity": 1, "unit_price": 99.99, "discount_percent": 15, "vat_rate": 20}])
+    # 99.99 - 14.9985 (-> 15.00) = 84.99
+    assert totals["total_ht"] == 84.99, totals
+    assert totals["total_vat"] == 17.0, totals  # 16.998 -> 17.00
+    print("✅ line discounts")
+
+
+def test_global_discount_allocation():
+    """Global discount lines are split pro rata between rates, remainder on the largest base"""
+    print("\n=== Testing global discount allocation ===")
+    items = [
+        {"quantity": 1, "unit_price": 200, "vat_rate": 20},
+        {"quantity": 1, "unit_price": 100, "vat_rate": 5.5},
+        {"type": "discount", "amount": 10},
+    ]
+    totals = price_document(items)
+    breakdown = {entry["rate"]: entry for entry in totals["vat_breakdown"]}
+    # 10.00 over 200/100 : 6.66 + 3.33, remaining cent on the 20% base
+    assert breakdown[20.0]["base_ht"] == 193.33, breakdown
+    assert breakdown[5.5]["base_ht"] == 96.67, breakdown
+    assert totals["total_ht"] == 290.0, totals
+    assert totals["total_vat"] == round(38.67 + 5.32, 2), totals
+
+    # Percent discount on every base, discount scoped to a single rate
+    items = [
+        {"quantity": 1, "unit_price": 200, "vat_rate": 20},
+        {"quantity": 1, "unit_price": 100, "vat_rate": 5.5},
+        {"type": "discount", "percent": 10},
+        {"type": "discount", "amount": 5, "vat_rate": 5.5},
+    ]
+    breakdown = {entry["rate"]: entry for entry in price_document(items)["vat_breakdown"]}
+    assert breakdown[20.0]["base_ht"] == 180.0, breakdown
+    assert breakdown[5.5]["base_ht"] == 85.0, breakdown
+    print("✅ global discount allocation")
+
+
+def _random_quote(rng):
+    return {
+        "vat_rate": rng.choice([None, None, 10]),
+        "items": [{
+            "quantity": rng.choice([1, 2, 0.5, 1.25, 3, 7.5, "2,5"]),
+            "unit_price": rng.choice([round(rng.uniform(0.01, 500), 2), 0.105, 12.345, "19,99"]),
+            "vat_rate": rng.choice([None, 5.5, 10, 20]),
+            "discount_percent": rng.choice([None, 0, 5, 12.5]),
+        } for _ in range(rng.randint(0, 25))],
+    }
+
+
+def test_reprice_batch_matches_price_document():
+    """The vectorized batch path returns exactly what price_document returns"""
+    print("\n=== Testing reprice_batch == price_document ===")
+    rng = random.Random(20)
+    quotes = [_random_quote(rng) for _ in range(2000)]
+    # A few quotes with global discount lines take the per-document path
+    for quote in quotes[:50]:
+        quote["items"].append({"type": "discount", "amount": 3})
+    countries = [rng.choice(["FR", "BE", "CH", "CA", None]) for _ in quotes]
+
+    batch = reprice_batch(quotes, countries)
+    for quote, country, result in zip(quotes, countries, batch):
+        expected = price_document(quote["items"], country=country, vat_rate=quote["vat_rate"])
+        assert result == expected, (quote, country, result, expected)
+
+    remap = {Decimal("5.5"): Decimal("6"), Decimal("10"): Decimal("12")}
+    batch = reprice_batch(quotes, countries, remap)
+    for quote, country, result in zip(quotes, countries, batch):
+        expected = price_document(remap_rates(quote["items"], remap), country=country, vat_rate=quote["vat_rate"])
+        assert result == expected, (quote, country, result, expected)
+    print(f"✅ reprice_batch matches price_document on {len(quotes)} quotes")
+
+
+if __name__ == "__main__":
+    tests = [
+        test_half_up_rounding,
+        test_vat_rounding_modes,
+        test_default_rates,
+        test_line_discount,
+        test_global_discount_allocation,
+        test_reprice_batch_matches_price_document,
+    ]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"\n❌ Pricing rule broken: {e}")
+        sys.exit(1)
+    print("\n✅ All pricing rules hold")